@@ -1,11 +1,116 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.services.metrics import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = "postgresql://" + SQLALCHEMY_DATABASE_URL[len("postgres://"):]
+
+# Pool settings (ignored for in-memory SQLite, which is a single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# "sqlite-production": WAL, tuned pragmas, a read-only reader pool and a single writer
+# connection. Only applies to file-backed SQLite; ignored for other databases.
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))  # negative = KiB per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(DB_POOL_SIZE)))
+
+def _async_url(url: str) -> str:
+    """Map a sync URL onto its async driver: aiosqlite for SQLite, asyncpg for PostgreSQL."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:"):
+        return "postgresql+asyncpg:" + url[len("postgresql:"):]
+    return url
+
+def _engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+            return options
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def _sqlite_file(url: str) -> bool:
+    database = make_url(url).database
+    return url.startswith("sqlite") and bool(database) and database != ":memory:"
+
+SQLITE_PRODUCTION = DB_PROFILE == "sqlite-production" and _sqlite_file(SQLALCHEMY_DATABASE_URL)
+
+def _read_only_url(url: str) -> str:
+    """The same SQLite file opened as a read-only URI (mode=ro)."""
+    parsed = make_url(url)
+    return parsed.set(
+        database=f"file:{parsed.database}",
+        query={**parsed.query, "mode": "ro", "uri": "true"},
+    ).render_as_string(hide_password=False)
+
+def _writer_options(url: str) -> dict:
+    options = _engine_options(url)
+    # SQLite allows one writer at a time; queue writes on one connection instead of on file locks
+    options.update(pool_size=1, max_overflow=0)
+    return options
+
+def _reader_options(url: str) -> dict:
+    options = _engine_options(url)
+    options.update(pool_size=DB_READ_POOL_SIZE)
+    return options
+
+def _apply_pragmas(sync_engine, writer: bool):
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if writer:
+            # Persistent on the file; readers never block the writer and vice versa
+            cursor.execute("PRAGMA journal_mode=WAL")
+        else:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+if SQLITE_PRODUCTION:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_writer_options(SQLALCHEMY_DATABASE_URL))
+    read_engine = create_engine(_read_only_url(SQLALCHEMY_DATABASE_URL), **_reader_options(SQLALCHEMY_DATABASE_URL))
+    async_engine = create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), **_writer_options(SQLALCHEMY_DATABASE_URL))
+    async_read_engine = create_async_engine(
+        _async_url(_read_only_url(SQLALCHEMY_DATABASE_URL)), **_reader_options(SQLALCHEMY_DATABASE_URL)
+    )
+    _apply_pragmas(engine, writer=True)
+    _apply_pragmas(read_engine, writer=False)
+    _apply_pragmas(async_engine.sync_engine, writer=True)
+    _apply_pragmas(async_read_engine.sync_engine, writer=False)
+else:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL))
+    async_engine = create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), **_engine_options(SQLALCHEMY_DATABASE_URL))
+    read_engine = engine
+    async_read_engine = async_engine
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay loaded after commit, no implicit IO on access
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+# Sessions for queries that never write; a read-only pool under the sqlite-production profile
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+
+# Query counts and durations for /metrics
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if SQLITE_PRODUCTION:
+    instrument_engine(read_engine)
+    instrument_engine(async_read_engine.sync_engine)
 
 Base = declarative_base()
 
@@ -14,4 +119,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -1,39 +1,168 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import importlib
+import os
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from app.database import engine, get_db, Base  # Add Base to the import
-from app.models import user as models
-from app.routers import auth, users, crypto, weather
-
-app = FastAPI()
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import async_engine, async_read_engine, get_async_db
+from app.services.http_clients import clients
+from app.services.cache import StaleDataMiddleware
+from app.services.metrics import MetricsMiddleware, registry
+from app.services.photo_storage import (
+    MAX_UPLOAD_BYTES, UPLOAD_DIR, UPLOAD_URL_PREFIX, ImmutableStaticFiles, UploadSizeLimitMiddleware
 )
+from app.services.startup import StartupReport
+
+# Router name -> module; each module exposes `router`
+ROUTERS = {
+    "auth": "app.routers.auth",
+    "users": "app.routers.users",
+    "crypto": "app.routers.crypto",
+    "weather": "app.routers.weather",
+}
+ENABLED_ROUTERS = [name.strip() for name in os.getenv("ENABLED_ROUTERS", ",".join(ROUTERS)).split(",") if name.strip()]
+# Create missing tables on startup; set to 0 when running `python -m app.migrations` at deploy time
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+# Seconds from import to ready before a warning is logged
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
+
+
+def _lifespan(report: StartupReport, auto_migrate: bool, modules: list):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        with report.step("import services"):
+            from app.services.hashing import hasher
+            from app.services.revocation import revocations
+            from app.services.thumbnails import thumbnails
+        if auto_migrate:
+            with report.step("migrations"):
+                from app.migrations import run_migrations_async
+                await run_migrations_async()
+        # One pooled upstream client per host for the lifetime of the worker
+        with report.step("start http clients"):
+            await clients.start()
+        # bcrypt runs in its own bounded pool so it never blocks the event loop
+        with report.step("start hasher"):
+            hasher.start()
+        # Loads unexpired revocations and starts the background pruner
+        with report.step("start revocations"):
+            await revocations.start()
+        # Served by the /uploads mount and written by uploads and the thumbnail pipeline
+        with report.step("create upload dir"):
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+        # Photo derivatives are rendered in a process pool
+        with report.step("start thumbnails"):
+            thumbnails.start()
+        # Routers may expose async `startup()`/`shutdown()` hooks for their own background work
+        for module in modules:
+            hook = getattr(module, "startup", None)
+            if hook is not None:
+                with report.step(f"start {module.__name__}"):
+                    await hook()
+        report.finish()
+        try:
+            yield
+        finally:
+            for module in modules:
+                hook = getattr(module, "shutdown", None)
+                if hook is not None:
+                    await hook()
+            await thumbnails.shutdown()
+            await revocations.stop()
+            hasher.shutdown()
+            await clients.close()
+            await async_engine.dispose()
+            if async_read_engine is not async_engine:
+                await async_read_engine.dispose()
+    return lifespan
+
+
+def create_app(routers: Optional[Iterable[str]] = None, auto_migrate: Optional[bool] = None) -> FastAPI:
+    """Build the application, importing only the routers that are enabled.
+
+    Nothing here touches the database; schema creation happens in the
+    lifespan (or ahead of time via `python -m app.migrations`).
+    """
+    report = StartupReport(STARTUP_BUDGET_SECONDS, started=_IMPORT_STARTED)
+    report.record("import app.main", time.perf_counter() - _IMPORT_STARTED)
+    routers = ENABLED_ROUTERS if routers is None else list(routers)
+    auto_migrate = AUTO_MIGRATE if auto_migrate is None else auto_migrate
+    unknown = [name for name in routers if name not in ROUTERS]
+    if unknown:
+        raise ValueError(f"Unknown routers in ENABLED_ROUTERS: {', '.join(unknown)}")
+
+    modules = []
+    app = FastAPI(lifespan=_lifespan(report, auto_migrate, modules))
+    app.state.startup_report = report
+
+    # Abort oversized photo uploads while they stream in
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_bytes=MAX_UPLOAD_BYTES,
+        paths=["/users/profile/photo"],
+    )
+
+    # Per-route latency histograms and in-flight count, exported at /metrics
+    app.add_middleware(MetricsMiddleware)
+
+    # X-Data-Stale header when a response was built from a snapshot past its TTL
+    app.add_middleware(StaleDataMiddleware)
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Data-Stale"],
+    )
+
+    # Include routers
+    for name in routers:
+        with report.step(f"import router {name}"):
+            module = importlib.import_module(ROUTERS[name])
+        modules.append(module)
+        app.include_router(module.router)
+
+    # Content-addressed profile photos, cacheable forever. The directory is created by the
+    # lifespan, so building the app stays free of filesystem side effects
+    app.mount(UPLOAD_URL_PREFIX, ImmutableStaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to the Authentication API"}
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/hashing-stats")
+    def hashing_stats():
+        from app.services.hashing import hasher
+        return hasher.stats()
+
+    @app.get("/startup-report")
+    def startup_report():
+        return report.as_dict()
+
+    @app.get("/test-db")
+    async def test_db(db: AsyncSession = Depends(get_async_db)):
+        try:
+            await db.execute(text("SELECT 1"))
+            return {"message": "Database connection successful"}
+        except Exception as e:
+            return {"error": f"Database connection failed: {str(e)}"}
+
+    return app
+
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
-# Include routers
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(crypto.router)
-app.include_router(weather.router)  # Remove the duplicate line
-
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the Authentication API"}
-
-@app.get("/test-db")
-def test_db(db: Session = Depends(get_db)):
-    try:
-        # Try to create all tables
-        Base.metadata.create_all(bind=engine)
-        return {"message": "Database connection successful"}
-    except Exception as e:
-        return {"error": f"Database connection failed: {str(e)}"}
\ No newline at end of file
+app = create_app()
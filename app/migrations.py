@@ -0,0 +1,54 @@
+"""Schema setup, run explicitly rather than as a side effect of importing the app.
+
+    python -m app.migrations
+
+The app lifespan runs the same step on startup unless AUTO_MIGRATE=0.
+"""
+from sqlalchemy import inspect, text
+
+from app.database import Base, async_engine, engine
+
+
+def load_models():
+    """Import every model module so its tables are registered on Base."""
+    from app.models import photo, token, user  # noqa: F401
+
+
+def _add_new_columns(conn):
+    """create_all leaves existing tables alone: add the nullable columns (and their
+    indexes) that models gained since those tables were created."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        added = [column for column in table.columns if column.name not in existing and column.nullable]
+        for column in added:
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+            ))
+        for index in table.indexes:
+            if any(column.name in index.columns for column in added):
+                index.create(conn, checkfirst=True)
+
+
+def _migrate(conn):
+    Base.metadata.create_all(conn)
+    _add_new_columns(conn)
+
+
+def run_migrations():
+    load_models()
+    with engine.begin() as conn:
+        _migrate(conn)
+
+
+async def run_migrations_async():
+    load_models()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_migrate)
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print("Schema up to date: " + ", ".join(sorted(Base.metadata.tables)))
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, UniqueConstraint
+from app.database import Base
+
+class PhotoVariant(Base):
+    __tablename__ = "photo_variants"
+    __table_args__ = (UniqueConstraint("photo_url", "size"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    photo_url = Column(String, index=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    url = Column(String, nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    # Lets each worker fetch only the revocations made since it last looked
+    revoked_at = Column(DateTime, index=True)
@@ -1,31 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, DateTime
-from passlib.context import CryptContext
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, EmailStr
-import requests
-from app.database import get_db, Base
+import hashlib
+import httpx
+import os
+import uuid
+from app.database import get_async_db, get_async_read_db
 from app.models.user import User
-
-# Add BlacklistedToken model
-class BlacklistedToken(Base):
-    __tablename__ = "blacklisted_tokens"
-    id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
-    blacklisted_on = Column(DateTime, default=datetime.utcnow)
+from app.services.cache import TTLCache
+from app.services.hashing import hasher
+from app.services.http_clients import get_facebook_client
+from app.services.revocation import revocations, token_id
+from app.services.user_cache import user_cache
 
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"]
 )
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Configuration
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
@@ -48,28 +46,89 @@ class Token(BaseModel):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Claims of already verified tokens, keyed by token digest and dropped at `exp`
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, name="verified_tokens")
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+# Verified Graph API /me results, keyed by a digest of the Facebook access token
+FACEBOOK_PROFILE_CACHE_TTL = float(os.getenv("FACEBOOK_PROFILE_CACHE_TTL", "300"))
+facebook_profiles = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=FACEBOOK_PROFILE_CACHE_TTL, name="facebook_profiles")
+
+async def _facebook_profile(client: httpx.AsyncClient, access_token: str) -> dict:
+    key = _token_key(access_token)
+    profile = facebook_profiles.get(key)
+    if profile is None:
+        response = await client.get(
+            "/me",
+            params={
+                "fields": "id,name,email",
+                "access_token": access_token
+            }
+        )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid Facebook token"
+            )
+        data = response.json()
+        if not data.get("email") or not data.get("id"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Facebook account has no email address"
+            )
+        profile = {"id": data["id"], "name": data.get("name"), "email": data["email"]}
+        facebook_profiles.set(key, profile)
+    return profile
+
+async def _upsert_facebook_user(db: AsyncSession, profile: dict) -> User:
+    for attempt in range(2):
+        user = (await db.execute(select(User).where(User.email == profile["email"]))).scalars().first()
+        if user is None:
+            user = User(email=profile["email"], full_name=profile["name"], facebook_id=profile["id"])
+            db.add(user)
+        elif user.facebook_id == profile["id"] and (user.full_name or not profile["name"]):
+            return user
+        else:
+            user.facebook_id = profile["id"]
+            user.full_name = user.full_name or profile["name"]
+        try:
+            await db.commit()
+            return user
+        except IntegrityError:
+            # Another worker inserted the same email first; update that row instead
+            await db.rollback()
+            if attempt:
+                raise
+
 @router.post("/register", response_model=Token)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == user_data.email).first():
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    # Hash before the first query: the session only checks out the writer connection then
+    hashed_password = await hasher.hash(user_data.password)
+    if (await db.execute(select(User).where(User.email == user_data.email))).scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = pwd_context.hash(user_data.password)
     user = User(
         email=user_data.email,
         hashed_password=hashed_password,
         full_name=user_data.full_name
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
+    if not user or not await hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -81,29 +140,25 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti identifies the token for revocation on logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 @router.post("/facebook-login")
-async def facebook_login(token: FacebookToken):
+async def facebook_login(
+    token: FacebookToken,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(get_facebook_client)
+):
     try:
         # Get user data from Facebook
-        response = requests.get(
-            "https://graph.facebook.com/me",
-            params={
-                "fields": "id,name,email",
-                "access_token": token.access_token
-            }
-        )
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Facebook token"
-            )
-        
-        user_data = response.json()
-        
+        user_data = await _facebook_profile(client, token.access_token)
+
+        # Create or link the account now so profile reads are plain lookups
+        await _upsert_facebook_user(db, user_data)
+        user_cache.invalidate(email=user_data["email"])
+
         # Create JWT token
         access_token = create_access_token(
             data={
@@ -114,6 +169,8 @@ async def facebook_login(token: FacebookToken):
         )
         return {"access_token": access_token, "token_type": "bearer"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -121,12 +178,19 @@ async def facebook_login(token: FacebookToken):
         )
 
 @router.post("/logout")
-async def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     try:
-        # Add token to blacklist
-        blacklisted_token = BlacklistedToken(token=token)
-        db.add(blacklisted_token)
-        db.commit()
+        # Expired tokens can still log out; they simply need no revocation entry
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    try:
+        # Revoke the token until it would have expired anyway
+        await revocations.revoke(db, token_id(payload, token), payload.get("exp", 0))
+        verified_tokens.pop(_token_key(token))
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(
@@ -134,31 +198,39 @@ async def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
             detail="Could not blacklist token"
         )
 
-# Add token blacklist check to oauth2_scheme
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    if db.query(BlacklistedToken).filter(BlacklistedToken.token == token).first():
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has been blacklisted"
-        )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Shared authentication dependency for every protected route.
+
+    The HS256 signature is checked once per token; later requests reuse the
+    cached claims until the token expires or is logged out.
+    """
+    key = _token_key(token)
+    claims = verified_tokens.get(key)
+    if claims is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials"
+            )
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
-        return {
+        claims = {
             "email": email,
             "name": payload.get("name"),
-            "facebook_id": payload.get("facebook_id")
+            "facebook_id": payload.get("facebook_id"),
+            "jti": token_id(payload, token)
         }
-    except JWTError:
+        verified_tokens.set(key, claims, expires_at=payload.get("exp"))
+    # In-memory lookup; logouts on other workers are picked up within REVOCATION_REFRESH_SECONDS
+    if revocations.is_revoked(claims["jti"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
\ No newline at end of file
+            detail="Token has been blacklisted"
+        )
+    return claims
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
+import logging
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from enum import Enum
 from typing import List, Dict, Optional
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-import httpx
 from pydantic import BaseModel
-from app.routers.auth import oauth2_scheme
+from app.routers.auth import get_current_user
+from app.services.cache import SnapshotCache
+from app.services.http_clients import BINANCE, clients
+from app.services.chart_series import change_from_first, downsample_ohlc, ema, sma, to_list
+from app.services.klines import CLOSE, HIGH, LOW, OPEN, KlineStore, MAX_KLINES
+from app.services.metrics import registry
+from app.services.responses import encoded_response, response_cache
+from app.services.shared_snapshot import shared_loader
+from app.services.ticker_index import TickerIndex
+from app.services.ticker_stream import TickerHub
+
+logger = logging.getLogger(__name__)
 
 # Define the router
 router = APIRouter(
@@ -37,9 +51,71 @@ class CryptoResponse(BaseModel):
     sort_by: str
     sort_order: str
 
+class CryptoBatchResponse(BaseModel):
+    data: List[CryptoTicker]
+    missing: List[str]
+    count: int
+    timestamp: str
+
+# The full 24hr ticker feed is shared by every /tickers request
+TICKER_CACHE_TTL = float(os.getenv("TICKER_CACHE_TTL", "5"))
+TICKER_CACHE_MAX_STALE = float(os.getenv("TICKER_CACHE_MAX_STALE", "60"))
+# After that, the last snapshot still stands in while Binance is failing or its breaker is open
+TICKER_CACHE_STALE_IF_ERROR = float(os.getenv("TICKER_CACHE_STALE_IF_ERROR", "3600"))
+
+async def fetch_24hr_tickers() -> TickerIndex:
+    response = await clients.get(BINANCE).get("/api/v3/ticker/24hr")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"Binance API error: {response.text}")
+    # Parse and presort once per snapshot rather than once per request
+    return TickerIndex(response.json())
+
+# With SHARED_SNAPSHOT_DIR set, one worker fetches and the rest map its published file
+load_24hr_tickers, shared_tickers = shared_loader(
+    "tickers", fetch_24hr_tickers, encode=TickerIndex.to_arrays, decode=TickerIndex.from_arrays,
+    interval=TICKER_CACHE_TTL
+)
+
+ticker_cache = SnapshotCache(
+    load_24hr_tickers, ttl=TICKER_CACHE_TTL, max_stale=TICKER_CACHE_MAX_STALE, name="tickers",
+    stale_if_error=TICKER_CACHE_STALE_IF_ERROR
+)
+
+MAX_BATCH_SYMBOLS = int(os.getenv("MAX_BATCH_SYMBOLS", "100"))
+
+# One poller feeds every /tickers/stream subscriber
+TICKER_STREAM_INTERVAL = float(os.getenv("TICKER_STREAM_INTERVAL", "2"))
+TICKER_STREAM_QUEUE_SIZE = int(os.getenv("TICKER_STREAM_QUEUE_SIZE", "16"))
+TICKER_STREAM_HEARTBEAT = float(os.getenv("TICKER_STREAM_HEARTBEAT", "15"))
+
+ticker_hub = TickerHub(
+    ticker_cache,
+    poll_interval=TICKER_STREAM_INTERVAL,
+    queue_size=TICKER_STREAM_QUEUE_SIZE,
+    heartbeat=TICKER_STREAM_HEARTBEAT
+)
+registry.gauge("ticker_stream_subscribers", "Open /crypto/tickers/stream connections",
+               function=lambda: ticker_hub.subscriber_count)
+
+async def startup():
+    """Called by the app lifespan: starts publishing the shared ticker snapshot, if enabled."""
+    if shared_tickers is not None:
+        shared_tickers.start()
+
+async def shutdown():
+    """Called by the app lifespan on shutdown: ends open streams and the poller."""
+    await ticker_hub.stop()
+    if shared_tickers is not None:
+        await shared_tickers.stop()
+
+def _tickers_key(sort_by, sort_order, limit, min_volume, min_price, min_change, max_change, symbol_filter):
+    return ("tickers", sort_by.value, sort_order.value, limit, min_volume, min_price,
+            min_change, max_change, symbol_filter.upper() if symbol_filter else None)
+
 @router.get("/tickers", response_model=CryptoResponse)
 async def get_all_tickers(
-    token: str = Depends(oauth2_scheme),
+    request: Request,
+    current_user: dict = Depends(get_current_user),
     limit: int = Query(10, ge=1, le=100),
     min_volume: float = Query(0, ge=0),
     min_price: float = Query(0, ge=0),
@@ -50,107 +126,224 @@ async def get_all_tickers(
     max_change: float = Query(100, ge=-100, le=100)
 ):
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get("https://api.binance.com/api/v3/ticker/24hr")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail=f"Binance API error: {response.text}")
-            
-            data = response.json()
-            filtered_data = []
-            
-            for item in data:
-                try:
-                    price_change = float(item.get("priceChangePercent", 0))
-                    volume = float(item.get("volume", 0))
-                    price = float(item.get("lastPrice", 0))
-                    
-                    if (min_volume > 0 and volume < min_volume or
-                        min_price > 0 and price < min_price or
-                        price_change < min_change or
-                        price_change > max_change):
-                        continue
-                        
-                    if symbol_filter and symbol_filter.upper() not in item.get("symbol", "").upper():
-                        continue
-                        
-                    filtered_data.append(CryptoTicker(
-                        symbol=item.get("symbol", ""),
-                        lastPrice=item.get("lastPrice", "0"),
-                        priceChangePercent=item.get("priceChangePercent", "0"),
-                        volume=item.get("volume", "0"),
-                        highPrice=item.get("highPrice", "0"),
-                        lowPrice=item.get("lowPrice", "0"),
-                        quoteVolume=item.get("quoteVolume", "0")
-                    ))
-                except (ValueError, KeyError) as e:
-                    print(f"Error processing item: {item}, Error: {str(e)}")
-                    continue
-            
-            # Sort the data
-            # Updated sorting logic
-            sort_field_map = {
-                SortBy.VOLUME: "volume",
-                SortBy.PRICE: "lastPrice",
-                SortBy.CHANGE: "priceChangePercent"
-            }
-            sort_field = sort_field_map[sort_by]
-            sort_key = lambda x: float(getattr(x, sort_field))
-            filtered_data.sort(key=sort_key, reverse=(sort_order == SortOrder.DESC))
-            
-            # Apply limit
-            limited_data = filtered_data[:limit]
-            
+        snapshot = await ticker_cache.get()
+        index: TickerIndex = snapshot.value
+
+        def build() -> CryptoResponse:
+            rows = index.query(
+                sort_by=sort_by.value,
+                descending=(sort_order == SortOrder.DESC),
+                limit=limit,
+                min_volume=min_volume,
+                min_price=min_price,
+                min_change=min_change,
+                max_change=max_change,
+                symbol_filter=symbol_filter
+            )
+            limited_data = [CryptoTicker(**row) for row in rows]
             return CryptoResponse(
                 data=limited_data,
                 count=len(limited_data),
-                timestamp=str(data[0].get("closeTime", "")) if data else "",
+                timestamp=index.timestamp,
                 sort_by=sort_by.value,
                 sort_order=sort_order.value
             )
-            
+
+        # Serialized once per snapshot and parameter set
+        key = _tickers_key(sort_by, sort_order, limit, min_volume, min_price, min_change, max_change, symbol_filter)
+        return encoded_response(request, response_cache.get(key, snapshot.version, build))
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in get_all_tickers: {str(e)}")
+        logger.warning("Error in get_all_tickers: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/tickers/stream")
+async def stream_tickers(
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(10, ge=1, le=100),
+    min_volume: float = Query(0, ge=0),
+    min_price: float = Query(0, ge=0),
+    symbol_filter: Optional[str] = None,
+    sort_by: SortBy = Query(SortBy.VOLUME),
+    sort_order: SortOrder = Query(SortOrder.DESC),
+    min_change: float = Query(-100, ge=-100, le=100),
+    max_change: float = Query(100, ge=-100, le=100)
+):
+    """Server-sent events: a `snapshot` event with the full result, then a `diff`
+    event (changed rows, removed symbols, new order) whenever it changes."""
+    key = _tickers_key(sort_by, sort_order, limit, min_volume, min_price, min_change, max_change, symbol_filter)
+    params = dict(
+        sort_by=sort_by.value,
+        descending=(sort_order == SortOrder.DESC),
+        limit=limit,
+        min_volume=min_volume,
+        min_price=min_price,
+        min_change=min_change,
+        max_change=max_change,
+        symbol_filter=symbol_filter
+    )
+    # Fetched before the 200 goes out, so an upstream failure is still a proper 5xx/503
+    snapshot = await ticker_cache.get()
+    return StreamingResponse(
+        ticker_hub.events(key, params, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/tickers/by-symbol", response_model=CryptoBatchResponse)
+async def get_tickers_by_symbol(
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. BTCUSDT,ETHUSDT"),
+    current_user: dict = Depends(get_current_user)
+):
+    # Keep request order, drop blanks and duplicates
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=422, detail="No symbols given")
+    if len(requested) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+
+    index: TickerIndex = (await ticker_cache.get()).value
+    rows, missing = index.lookup(requested)
+    return CryptoBatchResponse(
+        data=[CryptoTicker(**row) for row in rows],
+        missing=missing,
+        count=len(rows),
+        timestamp=index.timestamp
+    )
+
 @router.get("/ticker/{symbol}", response_model=CryptoTicker)
-async def get_ticker(symbol: str, token: str = Depends(oauth2_scheme)):
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol.upper()}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"Symbol {symbol} not found")
-        return response.json()
+async def get_ticker(
+    symbol: str,
+    current_user: dict = Depends(get_current_user)
+):
+    index: TickerIndex = (await ticker_cache.get()).value
+    row = index.get(symbol)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Symbol {symbol} not found")
+    return row
 from datetime import datetime, timedelta
 
 class CryptoChart(BaseModel):
     timestamps: List[int]
     prices: List[float]
 
-@router.get("/chart/{symbol}")
+# Candles are fetched once per series, then only the newest ones are refreshed
+KLINE_REFRESH_SECONDS = float(os.getenv("KLINE_REFRESH_SECONDS", "5"))
+KLINE_MAX_SERIES = int(os.getenv("KLINE_MAX_SERIES", "512"))
+
+kline_store = KlineStore(
+    lambda: clients.get(BINANCE),
+    refresh_interval=KLINE_REFRESH_SECONDS,
+    max_series=KLINE_MAX_SERIES
+)
+
+@router.get("/chart/{symbol}", response_model=CryptoChart)
 async def get_crypto_chart(
+    request: Request,
     symbol: str,
     interval: str = "1h",
-    limit: int = 24,
-    token: str = Depends(oauth2_scheme)
+    limit: int = Query(24, ge=1, le=MAX_KLINES),
+    current_user: dict = Depends(get_current_user)
 ):
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.binance.com/api/v3/klines",
-                params={
-                    "symbol": symbol.upper(),
-                    "interval": interval,
-                    "limit": limit
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail=f"Symbol {symbol} not found")
-            
-            data = response.json()
-            return CryptoChart(
-                timestamps=[entry[0] for entry in data],
-                prices=[float(entry[4]) for entry in data]
-            )
-            
+        series, timestamps, ohlc = await kline_store.get(symbol, interval, limit)
+        body = response_cache.get(
+            ("chart", symbol.upper(), interval, limit),
+            series.version,
+            lambda: CryptoChart(timestamps=timestamps.tolist(), prices=ohlc[:, CLOSE].tolist())
+        )
+        return encoded_response(request, body)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ChartSeries(BaseModel):
+    symbol: str
+    timestamps: List[int]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    # Percent change of each close relative to the first one
+    change: List[float]
+    # Aligned with timestamps; null until the window has filled
+    sma: Optional[List[Optional[float]]] = None
+    ema: Optional[List[float]] = None
+
+class MultiChartResponse(BaseModel):
+    interval: str
+    series: List[ChartSeries]
+    missing: List[str]
+
+# Upstream kline fetches in flight at once across all /charts requests
+CHART_CONCURRENCY = int(os.getenv("CHART_CONCURRENCY", "8"))
+CHART_MAX_SYMBOLS = int(os.getenv("CHART_MAX_SYMBOLS", "20"))
+chart_semaphore = asyncio.Semaphore(CHART_CONCURRENCY)
+
+def _chart_series(symbol, timestamps, ohlc, points, sma_window, ema_window) -> ChartSeries:
+    closes = ohlc[:, CLOSE]
+    times, buckets, last = downsample_ohlc(timestamps, ohlc, points or len(timestamps))
+    # Averages run over every candle, then are sampled at each bucket's last candle
+    return ChartSeries(
+        symbol=symbol,
+        timestamps=times.tolist(),
+        open=buckets[:, OPEN].tolist(),
+        high=buckets[:, HIGH].tolist(),
+        low=buckets[:, LOW].tolist(),
+        close=buckets[:, CLOSE].tolist(),
+        change=change_from_first(buckets[:, CLOSE]).tolist(),
+        sma=to_list(sma(closes, sma_window)[last]) if sma_window else None,
+        ema=ema(closes, ema_window)[last].tolist() if ema_window else None
+    )
+
+@router.get("/charts", response_model=MultiChartResponse)
+async def get_crypto_charts(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. BTCUSDT,ETHUSDT"),
+    interval: str = "1h",
+    limit: int = Query(24, ge=1, le=MAX_KLINES),
+    points: Optional[int] = Query(None, ge=1, le=MAX_KLINES, description="Downsample to at most this many candles"),
+    sma_window: Optional[int] = Query(None, alias="sma", ge=1, le=MAX_KLINES),
+    ema_window: Optional[int] = Query(None, alias="ema", ge=1, le=MAX_KLINES),
+    current_user: dict = Depends(get_current_user)
+):
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=422, detail="No symbols given")
+    if len(requested) > CHART_MAX_SYMBOLS:
+        raise HTTPException(status_code=422, detail=f"At most {CHART_MAX_SYMBOLS} symbols per request")
+
+    async def load(symbol: str):
+        async with chart_semaphore:
+            return await kline_store.get(symbol, interval, limit)
+
+    results = await asyncio.gather(*(load(symbol) for symbol in requested), return_exceptions=True)
+    # Only an unknown symbol is "missing"; an upstream failure (open breaker, 5xx/429, transport
+    # error) fails the request rather than being cached as a body without that series
+    for symbol, result in zip(requested, results):
+        if isinstance(result, HTTPException):
+            if result.status_code != 404:
+                raise result
+        elif isinstance(result, Exception):
+            logger.warning("Chart fetch for %s failed: %s", symbol, result)
+            raise HTTPException(status_code=502, detail=f"Binance API error: {result}")
+
+    def build() -> MultiChartResponse:
+        series: List[ChartSeries] = []
+        missing: List[str] = []
+        for symbol, result in zip(requested, results):
+            if isinstance(result, HTTPException):
+                missing.append(symbol)
+            else:
+                _, timestamps, ohlc = result
+                series.append(_chart_series(symbol, timestamps, ohlc, points, sma_window, ema_window))
+        return MultiChartResponse(interval=interval, series=series, missing=missing)
+
+    # Rebuilt only when one of the underlying series changes
+    version = tuple(None if isinstance(result, Exception) else result[0].version for result in results)
+    key = ("charts", tuple(requested), interval, limit, points, sma_window, ema_window)
+    return encoded_response(request, response_cache.get(key, version, build))
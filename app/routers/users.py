@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import Optional
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Optional
 from pydantic import BaseModel, EmailStr
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_async_db, get_async_read_db
 from app.models.user import User
-from app.routers.auth import oauth2_scheme, SECRET_KEY, pwd_context, get_current_user  # Add get_current_user
-from jose import jwt
+from app.routers.auth import get_current_user
+from app.services.hashing import hasher
+from app.services.photo_storage import store_upload
+from app.services.thumbnails import load_variants, pick_variant, thumbnails
+from app.services.user_cache import user_cache
 from fastapi import Body  # Add this import at the top
 
+logger = logging.getLogger(__name__)
+
 # Define the router
 router = APIRouter(
     prefix="/users",
@@ -22,31 +30,42 @@ class UserProfile(BaseModel):
     phone: Optional[str] = None
     photo_url: Optional[str] = None
     facebook_id: Optional[str] = None
+    photo_variants: Dict[str, str] = {}
 
     class Config:
         from_attributes = True  # This enables ORM model serialization
 
+async def _cache_profile(db: AsyncSession, user: User) -> UserProfile:
+    # Store a compact copy, with its photo derivatives, for later reads
+    variants = await load_variants(db, user.photo_url)
+    return UserProfile.from_orm(user_cache.put(user, variants))
+
 @router.get("/profile", response_model=UserProfile)
 async def get_profile(
     current_user: dict = Depends(get_current_user),  # Changed to use get_current_user
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     try:
-        user = db.query(User).filter(User.email == current_user["email"]).first()
+        cached = user_cache.get_by_email(current_user["email"])
+        if cached:
+            return UserProfile.from_orm(cached)
+        
+        user = (await db.execute(select(User).where(User.email == current_user["email"]))).scalars().first()
         if not user:
+            # First visit: the read session can't write, so create through the writer
             user = User(
                 email=current_user["email"],
                 full_name=current_user.get("name"),
                 facebook_id=current_user.get("facebook_id")
             )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+            async with AsyncSessionLocal() as writer:
+                writer.add(user)
+                await writer.commit()
         
-        return UserProfile.from_orm(user)
+        return await _cache_profile(db, user)
         
     except Exception as e:
-        print(f"Profile error: {str(e)}")
+        logger.warning("Profile error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e)
@@ -61,23 +80,21 @@ class UserUpdate(BaseModel):
 @router.put("/profile", response_model=UserProfile)
 async def update_profile(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
 ):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
+        email = current_user["email"]
         
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         for field, value in user_update.dict(exclude_unset=True).items():
             setattr(user, field, value)
         
-        db.commit()
-        db.refresh(user)
-        return user
+        await db.commit()
+        return await _cache_profile(db, user)
         
     except Exception as e:
         raise HTTPException(
@@ -88,37 +105,51 @@ async def update_profile(
 @router.post("/profile/photo", response_model=UserProfile)
 async def upload_photo(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
 ):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
+        email = current_user["email"]
         
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Create uploads directory if it doesn't exist
-        import os
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Save file and update user photo_url
-        file_location = f"uploads/{file.filename}"
-        with open(file_location, "wb+") as file_object:
-            file_object.write(await file.read())
+        # Streamed to disk in chunks and stored under its content hash
+        file_location = await store_upload(file)
         
         user.photo_url = file_location
-        db.commit()
-        db.refresh(user)
-        return user
+        await db.commit()
+        # Derivatives are rendered in the background, off the request path
+        thumbnails.submit(file_location, email)
+        return await _cache_profile(db, user)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
+@router.get("/profile/photo")
+async def get_photo(
+    size: int = Query(128, ge=1),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Redirects to the smallest stored variant of the photo that is at least `size` px."""
+    profile = user_cache.get_by_email(current_user["email"])
+    if profile is None:
+        user = (await db.execute(select(User).where(User.email == current_user["email"]))).scalars().first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        profile = await _cache_profile(db, user)
+    url = pick_variant(profile.photo_url, profile.photo_variants, size)
+    if not url:
+        raise HTTPException(status_code=404, detail="No profile photo")
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
 class PasswordUpdate(BaseModel):
     current_password: str
     new_password: str
@@ -126,47 +157,51 @@ class PasswordUpdate(BaseModel):
 @router.put("/profile/password")
 async def update_password(
     password_data: PasswordUpdate,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: dict = Depends(get_current_user)
 ):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
+        email = current_user["email"]
         
-        user = db.query(User).filter(User.email == email).first()
-        if not user or not pwd_context.verify(password_data.current_password, user.hashed_password):
+        hashed_password = (await db.execute(select(User.hashed_password).where(User.email == email))).scalar()
+        # End the read transaction so no connection is held while hashing
+        await db.rollback()
+        if not hashed_password or not await hasher.verify(password_data.current_password, hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Current password is incorrect"
             )
         
-        user.hashed_password = pwd_context.hash(password_data.new_password)
-        db.commit()
+        new_hash = await hasher.hash(password_data.new_password)
+        # The writer is only checked out for the UPDATE itself
+        async with AsyncSessionLocal() as writer:
+            await writer.execute(update(User).where(User.email == email).values(hashed_password=new_hash))
+            await writer.commit()
         return {"message": "Password updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not update password"
         )
 
-@router.put("/profile/photo-url")
+@router.put("/profile/photo-url", response_model=UserProfile)
 async def update_photo_url(
     photo_url: str = Body(...),  # Changed from query parameter to request body
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
 ):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
+        email = current_user["email"]
         
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         user.photo_url = photo_url
-        db.commit()
-        db.refresh(user)
-        return user
+        await db.commit()
+        return await _cache_profile(db, user)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-import httpx
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional
 from pydantic import BaseModel
+from app.routers.auth import get_current_user
+from app.services.responses import encoded_response, response_cache
+from app.services.spatial import idw
+from app.services.weather_history import weather_history
+from app.services.weather_snapshot import WeatherSnapshot, shared_weather, weather_snapshots
 
 class Location(BaseModel):
     latitude: float
@@ -21,96 +26,186 @@ class WeatherData(BaseModel):
     timestamp: str
     readings: List[WeatherReading]
 
+class WeatherStation(BaseModel):
+    station_id: str
+    station_name: str
+    location: dict
+    temperature: float
+
+class WeatherResponse(BaseModel):
+    stations: List[WeatherStation]
+    timestamp: str
+
+class NearbyStation(WeatherStation):
+    distance_km: float
+
+class NearestResponse(BaseModel):
+    latitude: float
+    longitude: float
+    # Inverse-distance-weighted temperature from the stations below
+    temperature: Optional[float]
+    stations: List[NearbyStation]
+    timestamp: str
+
+class WeatherHistory(BaseModel):
+    station_id: str
+    start: int
+    end: int
+    bucket_seconds: int
+    # Bucket start times (epoch seconds) and per-bucket aggregates
+    timestamps: List[int]
+    min: List[float]
+    max: List[float]
+    avg: List[float]
+    count: List[int]
+
 router = APIRouter(
     prefix="/weather",
     tags=["weather"]
 )
 
+async def startup():
+    """Called by the app lifespan: starts recording readings for /history and publishing, if shared."""
+    if shared_weather is not None:
+        shared_weather.start()
+    await weather_history.start()
+
+async def shutdown():
+    await weather_history.stop()
+    if shared_weather is not None:
+        await shared_weather.stop()
+
 @router.get("/stations", response_model=List[Station])
-async def get_stations():
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://api.data.gov.sg/v1/environment/air-temperature")
-        data = response.json()
-        return data["metadata"]["stations"]
+async def get_stations(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    snapshot = await weather_snapshots.get()
+    index: WeatherSnapshot = snapshot.value
+    body = response_cache.get(
+        ("weather-stations",), snapshot.version,
+        lambda: [Station(**station).model_dump() for station in index.station_list]
+    )
+    return encoded_response(request, body)
 
 @router.get("/current", response_model=WeatherData)
-async def get_current_weather():
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://api.data.gov.sg/v1/environment/air-temperature")
-        data = response.json()
-        return data["items"][0]
+async def get_current_weather(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    snapshot = await weather_snapshots.get()
+    index: WeatherSnapshot = snapshot.value
+    body = response_cache.get(("weather-current",), snapshot.version, lambda: WeatherData(**index.current))
+    return encoded_response(request, body)
 
 @router.get("/station/{station_id}")
-async def get_station_weather(station_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://api.data.gov.sg/v1/environment/air-temperature")
-        data = response.json()
-        
-        # Find the station data
-        station = next((s for s in data["metadata"]["stations"] if s["id"] == station_id), None)
-        if not station:
-            raise HTTPException(status_code=404, detail="Station not found")
-            
-        # Find the current reading for this station
-        reading = next((r for r in data["items"][0]["readings"] if r["station_id"] == station_id), None)
-        
-        return {
-            "station": station,
-            "current_reading": reading,
-            "timestamp": data["items"][0]["timestamp"]
-        }
-from fastapi import APIRouter, HTTPException
-import httpx
-from typing import List
-from pydantic import BaseModel
-from datetime import datetime
-from app.routers.auth import oauth2_scheme
+async def get_station_weather(
+    station_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    index: WeatherSnapshot = (await weather_snapshots.get()).value
 
-router = APIRouter(
-    prefix="/weather",
-    tags=["weather"]
-)
+    station = index.station(station_id)
+    if not station:
+        raise HTTPException(status_code=404, detail="Station not found")
 
-class WeatherStation(BaseModel):
-    station_id: str
-    station_name: str
-    location: dict
-    temperature: float
-
-class WeatherResponse(BaseModel):
-    stations: List[WeatherStation]
-    timestamp: str
+    return {
+        "station": station,
+        "current_reading": index.reading(station_id),
+        "timestamp": index.timestamp
+    }
 
 @router.get("/temperature", response_model=WeatherResponse)
-async def get_temperature(token: str = Depends(oauth2_scheme)):
+async def get_temperature(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get("https://api.data.gov.sg/v1/environment/air-temperature")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch weather data")
-            
-            data = response.json()
-            stations = []
-            
-            for reading in data["items"][0]["readings"]:
-                station_metadata = next(
-                    (station for station in data["metadata"]["stations"] 
-                     if station["id"] == reading["station_id"]),
-                    None
-                )
-                
-                if station_metadata:
-                    stations.append(WeatherStation(
-                        station_id=reading["station_id"],
-                        station_name=station_metadata["name"],
-                        location=station_metadata["location"],
-                        temperature=reading["value"]
-                    ))
-            
-            return WeatherResponse(
-                stations=stations,
-                timestamp=data["items"][0]["timestamp"]
-            )
-            
+        snapshot = await weather_snapshots.get()
+        index: WeatherSnapshot = snapshot.value
+        body = response_cache.get(
+            ("temperature",), snapshot.version,
+            lambda: WeatherResponse(stations=index.rows, timestamp=index.timestamp)
+        )
+        return encoded_response(request, body)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/nearest", response_model=NearestResponse)
+async def get_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(3, ge=1, le=20),
+    current_user: dict = Depends(get_current_user)
+):
+    index: WeatherSnapshot = (await weather_snapshots.get()).value
+    stations = []
+    # Only stations with a current reading count towards k
+    candidates = min(len(index.tree), k + index.stations_without_reading)
+    for distance, position in index.tree.nearest(lat, lon, candidates):
+        station_id = index.tree.ids[position]
+        reading = index.reading(station_id)
+        if reading is None:
+            continue
+        station = index.station(station_id)
+        stations.append(NearbyStation(
+            station_id=station_id,
+            station_name=station["name"],
+            location=station["location"],
+            temperature=reading["value"],
+            distance_km=round(distance, 3)
+        ))
+        if len(stations) == k:
+            break
+    return NearestResponse(
+        latitude=lat,
+        longitude=lon,
+        temperature=idw([s.distance_km for s in stations], [s.temperature for s in stations]),
+        stations=stations,
+        timestamp=index.timestamp
+    )
+
+@router.get("/bbox", response_model=WeatherResponse)
+async def get_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    current_user: dict = Depends(get_current_user)
+):
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=422, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+    index: WeatherSnapshot = (await weather_snapshots.get()).value
+    stations = []
+    for position in index.tree.within(min_lat, min_lon, max_lat, max_lon):
+        station_id = index.tree.ids[position]
+        reading = index.reading(station_id)
+        if reading is not None:
+            station = index.station(station_id)
+            stations.append(WeatherStation(
+                station_id=station_id,
+                station_name=station["name"],
+                location=station["location"],
+                temperature=reading["value"]
+            ))
+    return WeatherResponse(stations=stations, timestamp=index.timestamp)
+
+@router.get("/history/{station_id}", response_model=WeatherHistory)
+async def get_station_history(
+    station_id: str,
+    start: Optional[datetime] = Query(None, description="ISO 8601 or epoch seconds; default 24h before end"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 or epoch seconds; default now"),
+    points: int = Query(200, ge=1, le=2000),
+    current_user: dict = Depends(get_current_user)
+):
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    # Naive datetimes are taken as UTC
+    end_ts = int((end if end.tzinfo else end.replace(tzinfo=timezone.utc)).timestamp())
+    start_ts = int((start if start.tzinfo else start.replace(tzinfo=timezone.utc)).timestamp())
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    return await weather_history.history(station_id, start_ts, end_ts, points)
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Hashable, Optional, Set, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Names of the caches that served past-TTL data to the current request; see StaleDataMiddleware
+_stale_sources: ContextVar[Optional[Set[str]]] = ContextVar("stale_sources", default=None)
+
+
+def mark_stale(name: Optional[str]):
+    sources = _stale_sources.get()
+    if sources is not None and name is not None:
+        sources.add(name)
+
+
+class StaleDataMiddleware:
+    """Adds `X-Data-Stale: <cache names>` to responses built from data past its TTL."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sources: Set[str] = set()
+        token = _stale_sources.set(sources)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and sources:
+                MutableHeaders(scope=message).append("X-Data-Stale", ",".join(sorted(sources)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _stale_sources.reset(token)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    value: Any
+    fetched_at: float
+    version: int
+    stale: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class SnapshotCache:
+    """Keeps the latest result of an expensive async loader in memory.
+
+    - fresh (age < ttl): served as is
+    - stale (age < ttl + max_stale): served as is while one background
+      refresh runs, so readers never wait on the upstream once warm
+    - missing or too old: callers wait, but concurrent misses share a
+      single in-flight load (single-flight)
+    - if that load fails, the last snapshot is still served for up to
+      `stale_if_error` more seconds, so an upstream outage (or an open
+      circuit breaker) doesn't turn into errors
+
+    Snapshots served past their TTL have `stale=True` and mark the response
+    through StaleDataMiddleware.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl: float, max_stale: float = 0.0,
+                 name: Optional[str] = None, stale_if_error: float = 0.0):
+        self.loader = loader
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.stale_if_error = stale_if_error
+        self._snapshot: Optional[Snapshot] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._version = 0
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    async def get(self) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            age = snapshot.age
+            if age < self.ttl:
+                record_cache(self.name, "hit")
+                return snapshot
+            if age < self.ttl + self.max_stale:
+                record_cache(self.name, "stale")
+                self._start_refresh()
+                return self._stale(snapshot)
+        record_cache(self.name, "miss")
+        try:
+            # shield so a cancelled request doesn't cancel the load other callers share
+            return await asyncio.shield(self._start_refresh())
+        except Exception:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.age >= self.ttl + self.max_stale + self.stale_if_error:
+                raise
+            record_cache(self.name, "stale_if_error")
+            return self._stale(snapshot)
+
+    def _stale(self, snapshot: Snapshot) -> Snapshot:
+        mark_stale(self.name)
+        return replace(snapshot, stale=True)
+
+    async def refresh(self) -> Snapshot:
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._load())
+            self._inflight.add_done_callback(self._log_refresh_error)
+        return self._inflight
+
+    async def _load(self) -> Snapshot:
+        value = await self.loader()
+        previous = self._snapshot
+        if previous is not None and value is previous.value:
+            # Nothing new (e.g. a shared snapshot whose file version hasn't moved):
+            # keep the version so work keyed on it isn't redone
+            self._snapshot = Snapshot(value=value, fetched_at=time.monotonic(), version=previous.version)
+            return self._snapshot
+        self._version += 1
+        self._snapshot = Snapshot(value=value, fetched_at=time.monotonic(), version=self._version)
+        return self._snapshot
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Snapshot refresh failed: %s", task.exception())
+
+
+class TTLCache:
+    """Bounded LRU mapping where every entry carries its own expiry.
+
+    Expiry times are wall-clock epoch seconds so they can come straight
+    from a JWT's `exp` claim.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            record_cache(self.name, "miss")
+            return default
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            record_cache(self.name, "miss")
+            return default
+        self._data.move_to_end(key)
+        record_cache(self.name, "hit")
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, without touching LRU order or hit/miss counters."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if self.ttl is not None else float("inf"))
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
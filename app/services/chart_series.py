@@ -0,0 +1,91 @@
+"""Vectorized derived series for charts: downsampled OHLC, SMA, EMA and change."""
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.klines import CLOSE, HIGH, LOW, OPEN
+
+# EMA blocks are sized so beta ** -block stays below this, well inside float64 range
+_EMA_MAX_SCALE = 1e100
+
+
+def bucket_bounds(n: int, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) index of `points` near-equal buckets over n rows."""
+    points = max(1, min(points, n))
+    edges = (np.arange(points + 1) * n) // points
+    return edges[:-1], edges[1:]
+
+
+def downsample_ohlc(times: np.ndarray, ohlc: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge candles into at most `points` buckets.
+
+    Returns bucket open times, OHLC rows and the index of each bucket's
+    last candle (for sampling other full-resolution series).
+    """
+    n = len(times)
+    if n == 0:
+        return times, ohlc, np.arange(0)
+    if points >= n:
+        return times, ohlc, np.arange(n)
+    starts, ends = bucket_bounds(n, points)
+    merged = np.empty((len(starts), 4), dtype=np.float64)
+    merged[:, OPEN] = ohlc[starts, OPEN]
+    merged[:, HIGH] = np.maximum.reduceat(ohlc[:, HIGH], starts)
+    merged[:, LOW] = np.minimum.reduceat(ohlc[:, LOW], starts)
+    merged[:, CLOSE] = ohlc[ends - 1, CLOSE]
+    return times[starts], merged, ends - 1
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average via a cumulative sum; NaN until `window` points exist."""
+    out = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return out
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def ema(values: np.ndarray, window: int) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (window + 1), seeded with the first value.
+
+    Uses the closed form y[j] = beta**j * (y[0] + alpha * sum(beta**-i * x[i])) per
+    block, carrying y across blocks so beta**-i never overflows.
+    """
+    n = len(values)
+    out = np.empty(n)
+    if n == 0:
+        return out
+    alpha = 2.0 / (window + 1)
+    beta = 1.0 - alpha
+    out[0] = values[0]
+    if beta == 0.0:
+        out[:] = values
+        return out
+    block = max(1, int(math.log(_EMA_MAX_SCALE) / -math.log(beta)))
+    powers = beta ** np.arange(1, min(block, n) + 1)
+    prev = values[0]
+    for start in range(1, n, block):
+        chunk = values[start:start + block]
+        p = powers[:len(chunk)]
+        out[start:start + len(chunk)] = p * (prev + alpha * np.cumsum(chunk / p))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def change_from_first(values: np.ndarray) -> np.ndarray:
+    """Percent change of each point relative to the first one."""
+    if len(values) == 0 or values[0] == 0:
+        return np.zeros(len(values))
+    return (values / values[0] - 1.0) * 100.0
+
+
+def to_list(values: np.ndarray) -> List[Optional[float]]:
+    """JSON-ready list with NaN as None."""
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    out = values.astype(object)
+    out[missing] = None
+    return out.tolist()
@@ -0,0 +1,112 @@
+"""Per-upstream circuit breaker.
+
+Every call through an upstream client is recorded as good or bad; a call is
+bad if it raised, returned 5xx/429, or took at least `slow_seconds` to deliver
+its whole response. Once at least `min_calls` of the last `window` calls were
+recorded and the bad share reaches `failure_ratio`, the breaker opens and
+calls fail immediately with a 503. After `open_seconds` it lets `half_open_probes` calls through: one good
+probe closes it, a bad one opens it again.
+"""
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque
+
+from fastapi import HTTPException, status
+
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(HTTPException):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Upstream {upstream} is unavailable",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_ratio: float, window: int, min_calls: int,
+                 slow_seconds: float, open_seconds: float, half_open_probes: int = 1):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = bad
+        self._bad = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        circuit_state.set(name, value=_STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning("Circuit for %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        circuit_state.set(self.name, value=_STATE_VALUES[state])
+        circuit_transitions.inc(self.name, state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._probes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+            self._bad = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == OPEN:
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                circuit_rejections.inc(self.name)
+                raise CircuitOpenError(self.name, remaining)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                circuit_rejections.inc(self.name)
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes += 1
+
+    def record(self, ok: bool, elapsed: float):
+        bad = not ok or elapsed >= self.slow_seconds
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            self._transition(OPEN if bad else CLOSED)
+            return
+        if self.state == OPEN:
+            # Started before the breaker opened
+            return
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._bad -= self._outcomes[0]
+        self._outcomes.append(bad)
+        self._bad += bad
+        if len(self._outcomes) >= self.min_calls and self._bad >= self.failure_ratio * len(self._outcomes):
+            self._transition(OPEN)
+
+    def cancelled(self):
+        """A call was abandoned (e.g. the client went away): free its probe slot, record nothing."""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+
+circuit_state = registry.gauge(
+    "upstream_circuit_state", "Upstream circuit breaker state (0 closed, 1 half-open, 2 open)", ("upstream",)
+)
+circuit_transitions = registry.counter(
+    "upstream_circuit_transitions_total", "Upstream circuit breaker state changes", ("upstream", "state")
+)
+circuit_rejections = registry.counter(
+    "upstream_circuit_rejections_total", "Upstream calls refused while the breaker was open", ("upstream",)
+)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.services.metrics import registry
+
+# "thread" or "process"; bcrypt releases the GIL, so threads are usually enough
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Maximum hash/verify calls running or waiting before new ones get a 503
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module-level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: Optional[str]) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop in a bounded worker pool.
+
+    At most `max_queue` calls may be outstanding; beyond that callers are
+    rejected straight away with 503 instead of queueing behind the pool.
+    """
+
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        return await self._submit(_verify, password, hashed_password)
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            hash_rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        self.start()
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            hash_duration.observe(fn.__name__.lstrip("_"), value=elapsed)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_avg_seconds": self.latency_total / self.completed if self.completed else 0.0,
+            "latency_max_seconds": self.latency_max,
+        }
+
+
+hasher = PasswordHasher(HASH_EXECUTOR, HASH_WORKERS, HASH_MAX_QUEUE)
+
+hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt call latency including queueing", ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0, 10.0)
+)
+hash_rejected = registry.counter("password_hash_rejected_total", "bcrypt calls rejected because the queue was full")
+registry.gauge("password_hash_queue_depth", "bcrypt calls running or waiting", function=lambda: hasher.pending)
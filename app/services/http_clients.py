@@ -0,0 +1,212 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import upstream_duration, upstream_requests
+
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+BINANCE = "binance"
+DATA_GOV_SG = "data_gov_sg"
+FACEBOOK_GRAPH = "facebook_graph"
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    base_url: str
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    # Circuit breaker: see app/services/circuit_breaker.py
+    breaker_failure_ratio: float = 0.5
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_slow_seconds: float = 2.0
+    breaker_open_seconds: float = 30.0
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        return CircuitBreaker(
+            name,
+            failure_ratio=self.breaker_failure_ratio,
+            window=self.breaker_window,
+            min_calls=self.breaker_min_calls,
+            slow_seconds=self.breaker_slow_seconds,
+            open_seconds=self.breaker_open_seconds,
+        )
+
+
+def _upstream_from_env(prefix: str, base_url: str) -> UpstreamConfig:
+    return UpstreamConfig(
+        base_url=os.getenv(f"{prefix}_BASE_URL", base_url),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", "10")),
+        connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", "5")),
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", "30")),
+        http2=os.getenv(f"{prefix}_HTTP2", "1") == "1",
+        breaker_failure_ratio=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATIO", "0.5")),
+        breaker_window=int(os.getenv(f"{prefix}_BREAKER_WINDOW", "20")),
+        breaker_min_calls=int(os.getenv(f"{prefix}_BREAKER_MIN_CALLS", "5")),
+        breaker_slow_seconds=float(os.getenv(f"{prefix}_BREAKER_SLOW_SECONDS", "2")),
+        breaker_open_seconds=float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", "30")),
+    )
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    BINANCE: _upstream_from_env("BINANCE", "https://api.binance.com"),
+    DATA_GOV_SG: _upstream_from_env("DATA_GOV_SG", "https://api.data.gov.sg"),
+    FACEBOOK_GRAPH: _upstream_from_env("FACEBOOK_GRAPH", "https://graph.facebook.com"),
+}
+
+
+class _TimedStream(httpx.AsyncByteStream):
+    """A response body that reports its call once it is closed, so the timing covers the whole body."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, done: Callable[[Optional[bool]], None]):
+        self.stream = stream
+        self.done = done
+        self.ok: Optional[bool] = True
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.stream:
+                yield chunk
+        except Exception:
+            self.ok = False
+            raise
+        except BaseException:
+            # Cancelled mid-body: nothing is known about the upstream
+            self.ok = None
+            raise
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self.done(self.ok)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Counts and times every call made through an upstream client, and feeds its circuit breaker.
+
+    A call is timed until its response body has been read and closed, so an
+    upstream that sends headers quickly but trickles the body counts as slow.
+    """
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport, breaker: Optional[CircuitBreaker] = None):
+        self.upstream = upstream
+        self.transport = transport
+        self.breaker = breaker
+
+    def _finish(self, request: httpx.Request, started: float, status: str, ok: Optional[bool]):
+        elapsed = time.perf_counter() - started
+        upstream_requests.inc(self.upstream, status)
+        upstream_duration.observe(self.upstream, request.url.path, value=elapsed)
+        if self.breaker is not None:
+            if ok is None:
+                self.breaker.cancelled()
+            else:
+                self.breaker.record(ok, elapsed)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.breaker is not None:
+            self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            self._finish(request, started, "error", False)
+            raise
+        except BaseException:
+            self._finish(request, started, "error", None)
+            raise
+        status = str(response.status_code)
+        ok = response.status_code < 500 and response.status_code != 429
+        if response.is_closed:
+            # The body was already in memory (e.g. from a mock transport)
+            self._finish(request, started, status, ok)
+            return response
+        response.stream = _TimedStream(
+            response.stream,
+            lambda body_ok: self._finish(request, started, status, None if body_ok is None else ok and body_ok)
+        )
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ClientRegistry:
+    """One pooled httpx.AsyncClient per upstream, shared by every request.
+
+    Clients are opened by the app lifespan (see app/main.py) and closed on
+    shutdown. `get` also creates a client on first use so code running
+    outside the lifespan (scripts, tests) still works.
+    """
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig]):
+        self.upstreams = upstreams
+        # Breakers outlive clients, so a reopened client keeps its upstream's state
+        self.breakers: Dict[str, CircuitBreaker] = {name: config.breaker(name) for name, config in upstreams.items()}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, name: str, config: UpstreamConfig) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=config.http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            transport=InstrumentedTransport(name, transport, self.breakers[name]),
+        )
+
+    async def start(self):
+        for name in self.upstreams:
+            self.get(name)
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client: Optional[httpx.AsyncClient] = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name, self.upstreams[name])
+            self._clients[name] = client
+        return client
+
+
+clients = ClientRegistry(UPSTREAMS)
+
+
+def get_binance_client() -> httpx.AsyncClient:
+    return clients.get(BINANCE)
+
+
+def get_weather_client() -> httpx.AsyncClient:
+    return clients.get(DATA_GOV_SG)
+
+
+def get_facebook_client() -> httpx.AsyncClient:
+    return clients.get(FACEBOOK_GRAPH)
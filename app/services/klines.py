@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from fastapi import HTTPException
+
+from app.services.cache import mark_stale
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Binance returns at most 1000 klines per request
+MAX_KLINES = 1000
+
+INTERVAL_MS: Dict[str, int] = {
+    "1s": 1_000,
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+    "1M": 31 * 86_400_000,
+}
+
+
+# Binance's error code for an unknown symbol (sent with a 400)
+INVALID_SYMBOL = -1121
+
+
+def _error_code(response: httpx.Response) -> Optional[int]:
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+# Column order of the OHLC arrays
+OPEN, HIGH, LOW, CLOSE = range(4)
+
+
+class RingBuffer:
+    """Fixed-capacity arrays of candle open times and OHLC prices.
+
+    Candles are kept in open-time order; once full, the oldest ones are
+    overwritten.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.ohlc = np.zeros((capacity, 4), dtype=np.float64)
+        self.start = 0
+        self.size = 0
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.times[(self.start + self.size - 1) % self.capacity])
+
+    def extend(self, times: np.ndarray, ohlc: np.ndarray) -> int:
+        """Append candles newer than the last one, replacing it if it reappears.
+
+        Returns how many slots changed.
+        """
+        changed = 0
+        last = self.last_time
+        if last is not None:
+            keep = times >= last
+            times, ohlc = times[keep], ohlc[keep]
+            if len(times) and times[0] == last:
+                slot = (self.start + self.size - 1) % self.capacity
+                if not np.array_equal(self.ohlc[slot], ohlc[0]):
+                    self.ohlc[slot] = ohlc[0]
+                    changed = 1
+                times, ohlc = times[1:], ohlc[1:]
+        times, ohlc = times[-self.capacity:], ohlc[-self.capacity:]
+        count = len(times)
+        if not count:
+            return changed
+        slots = (self.start + self.size + np.arange(count)) % self.capacity
+        self.times[slots] = times
+        self.ohlc[slots] = ohlc
+        overflow = max(0, self.size + count - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+        return changed + count
+
+    def tail(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        n = min(n, self.size)
+        slots = (self.start + self.size - n + np.arange(n)) % self.capacity
+        return self.times[slots], self.ohlc[slots]
+
+
+class KlineSeries:
+    def __init__(self, capacity: int):
+        self.buffer = RingBuffer(capacity)
+        self.lock = asyncio.Lock()
+        self.fetched_at = 0.0
+        # Upstream returned fewer candles than asked: there is no older history
+        self.exhausted = False
+        self.version = 0
+
+
+class KlineStore:
+    """In-memory kline history per (symbol, interval).
+
+    A series is filled once with the requested window, then only candles
+    at or after the last stored openTime are fetched, at most once per
+    `refresh_interval` seconds. The least recently used series are dropped
+    beyond `max_series`.
+    """
+
+    def __init__(self, client_factory, refresh_interval: float, max_series: int, capacity: int = MAX_KLINES):
+        self.client_factory = client_factory
+        self.refresh_interval = refresh_interval
+        self.max_series = max_series
+        self.capacity = capacity
+        self._series: "OrderedDict[Tuple[str, str], KlineSeries]" = OrderedDict()
+        # Store-wide, so a series evicted and reloaded never reuses an old version number
+        self._versions = itertools.count(1)
+
+    def _get_series(self, key: Tuple[str, str]) -> KlineSeries:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = KlineSeries(self.capacity)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        return series
+
+    async def _fetch(self, symbol: str, interval: str, limit: int, start_time: Optional[int] = None) -> List[list]:
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        client: httpx.AsyncClient = self.client_factory()
+        response = await client.get("/api/v3/klines", params=params)
+        if response.status_code != 200:
+            if response.status_code == 400 and _error_code(response) == INVALID_SYMBOL:
+                raise HTTPException(status_code=404, detail=f"Symbol {symbol} not found")
+            raise HTTPException(status_code=response.status_code, detail=f"Binance API error: {response.text}")
+        return response.json()
+
+    @staticmethod
+    def _columns(data: List[list]) -> Tuple[np.ndarray, np.ndarray]:
+        times = np.fromiter((entry[0] for entry in data), dtype=np.int64, count=len(data))
+        # Binance sends prices as strings in fields 1-4 (open, high, low, close)
+        ohlc = np.array([entry[1:5] for entry in data], dtype=np.float64).reshape(len(data), 4)
+        return times, ohlc
+
+    async def get(self, symbol: str, interval: str, limit: int) -> Tuple[KlineSeries, np.ndarray, np.ndarray]:
+        """Latest `limit` candles as (series, open times, OHLC rows)."""
+        symbol = symbol.upper()
+        limit = min(limit, self.capacity)
+        series = self._get_series((symbol, interval))
+        async with series.lock:
+            buffer = series.buffer
+            now = time.monotonic()
+            interval_ms = INTERVAL_MS.get(interval)
+            last = buffer.last_time
+            too_far_behind = (
+                last is not None and interval_ms is not None
+                and time.time() * 1000 - last > (self.capacity - 1) * interval_ms
+            )
+
+            if last is None or too_far_behind or (buffer.size < limit and not series.exhausted):
+                record_cache("klines", "miss")
+                try:
+                    data = await self._fetch(symbol, interval, limit)
+                except Exception as e:
+                    if last is None:
+                        raise
+                    # Binance is failing or its breaker is open: serve the (shorter or older) candles we have
+                    logger.warning("Kline fetch for %s %s failed: %s", symbol, interval, e)
+                    mark_stale("klines")
+                else:
+                    buffer.clear()
+                    buffer.extend(*self._columns(data))
+                    series.exhausted = len(data) < limit
+                    series.fetched_at = now
+                    series.version = next(self._versions)
+            elif now - series.fetched_at >= self.refresh_interval:
+                record_cache("klines", "refresh")
+                try:
+                    data = await self._fetch(symbol, interval, self.capacity, start_time=last)
+                except Exception as e:
+                    # Binance is failing or its breaker is open: serve the candles we have
+                    logger.warning("Kline refresh for %s %s failed: %s", symbol, interval, e)
+                    mark_stale("klines")
+                else:
+                    if len(data) >= self.capacity:
+                        # More new candles than we can hold: start over from the latest window
+                        buffer.clear()
+                    if buffer.extend(*self._columns(data)):
+                        series.version = next(self._versions)
+                    series.fetched_at = now
+            else:
+                record_cache("klines", "hit")
+
+            times, ohlc = buffer.tail(limit)
+            return series, times, ohlc
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import uuid
+from typing import Iterable
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from fastapi.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_URL_PREFIX = "/uploads"
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds {MAX_UPLOAD_BYTES} bytes"
+    )
+
+
+async def store_upload(file: UploadFile) -> str:
+    """Stream an upload to disk and return its public URL.
+
+    The file is copied in UPLOAD_CHUNK_SIZE chunks through async file I/O
+    while being hashed, and stored as <sha256>.<ext> so identical images
+    are kept once. URLs are content-addressed, so they never change meaning
+    and can be cached forever.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type, expected one of {sorted(ALLOWED_EXTENSIONS)}"
+        )
+
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    await anyio.Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                await out.write(chunk)
+
+        name = digest.hexdigest()
+        relative = f"{name[:2]}/{name}{extension}"
+        final_path = anyio.Path(UPLOAD_DIR, relative)
+        if await final_path.exists():
+            # Same content already stored
+            await anyio.Path(tmp_path).unlink()
+        else:
+            await final_path.parent.mkdir(parents=True, exist_ok=True)
+            await anyio.Path(tmp_path).rename(final_path)
+        return f"{UPLOAD_URL_PREFIX}/{relative}"
+    finally:
+        if await anyio.Path(tmp_path).exists():
+            await anyio.Path(tmp_path).unlink()
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Serves content-addressed uploads with long-lived cache headers."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized upload bodies with 413 before they are fully received.
+
+    Multipart bodies are parsed (and spooled) before the endpoint runs, so
+    the limit has to be enforced while the body streams in: up front from
+    Content-Length, and on the fly for chunked requests.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Allow for multipart boundaries and part headers around the file
+        limit = self.max_bytes + 16 * 1024
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send)
+                return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            if exceeded:
+                # Whatever error the body parser produced, answer 413 instead
+                if not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send: Send):
+        detail = f'{{"detail":"File exceeds {self.max_bytes} bytes"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": detail})
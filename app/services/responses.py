@@ -0,0 +1,150 @@
+"""Encode-once JSON responses with ETags and precompressed bodies.
+
+A hot endpoint describes its result by a cache key plus the version of the
+data it was built from. The body is serialized once per (key, version), and
+gzip/brotli variants are compressed on first demand, so repeat polls only pay
+for a dict lookup, and a matching If-None-Match gets an empty 304.
+"""
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app.services.metrics import record_cache
+
+# orjson and brotli are optional ("pip install orjson brotli")
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+# Bodies smaller than this are always sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def dumps(content: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class EncodedBody:
+    """One serialized result: identity bytes, a strong ETag and lazily compressed variants."""
+
+    def __init__(self, content: Any):
+        if hasattr(content, "model_dump"):
+            content = content.model_dump(mode="json")
+        self.identity = dumps(content)
+        self.etag = '"%s"' % hashlib.blake2b(self.identity, digest_size=16).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.identity, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.identity, compresslevel=GZIP_LEVEL, mtime=0)
+            self._encoded[encoding] = body
+        return body
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def _choose_encoding(request: Request, size: int) -> Optional[str]:
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    br = accepted.get("br", 0) if BROTLI_AVAILABLE else 0
+    gzip_quality = accepted.get("gzip", 0)
+    # The client's preference wins; on a tie brotli, being smaller
+    if br > 0 and br >= gzip_quality:
+        return "br"
+    if gzip_quality > 0:
+        return "gzip"
+    return None
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def encoded_response(request: Request, body: EncodedBody, headers: Optional[Dict[str, str]] = None) -> Response:
+    response_headers = {"ETag": body.etag, "Vary": "Accept-Encoding", **(headers or {})}
+    if _not_modified(request, body.etag):
+        return Response(status_code=304, headers=response_headers)
+    encoding = _choose_encoding(request, len(body.identity))
+    if encoding is None:
+        content = body.identity
+    else:
+        content = body.encoded(encoding)
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=response_headers)
+
+
+class ResponseCache:
+    """LRU of encoded bodies keyed by request parameters, rebuilt when the data version changes."""
+
+    def __init__(self, maxsize: int, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, EncodedBody]]" = OrderedDict()
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> EncodedBody:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            record_cache(self.name, "hit")
+            return entry[1]
+        record_cache(self.name, "miss")
+        body = EncodedBody(build())
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, name="responses")
@@ -0,0 +1,122 @@
+"""Token revocations (logout), checked on every authenticated request.
+
+Revoked jtis live in an in-memory dict, so the check itself never touches
+the database. Every REVOCATION_REFRESH_SECONDS (default 1) the dict picks up
+rows revoked since the last refresh, through the `revoked_at` index, so a
+logout on one worker is rejected by the others within about that long.
+Every REVOCATION_SYNC_SECONDS expired rows are pruned and the whole table
+is re-read.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.models.token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# How often expired revocations are pruned and the in-memory set is
+# re-read from the database
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+# How often revocations made by other workers are picked up
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "1"))
+# Each refresh re-reads this much before the previous one, for commits that
+# landed late or workers whose clocks are slightly behind
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+def _epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def token_id(payload: dict, token: str) -> str:
+    """The token's jti; tokens issued without one are identified by their digest."""
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationStore:
+    """Revoked token IDs, each kept only until the token's own expiry.
+
+    Lookups only read an in-memory dict (jti -> exp); `refresh` and `sync`
+    keep it current in the background.
+    """
+
+    def __init__(self, session_factory, read_session_factory, sync_interval: float, refresh_interval: float):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self.sync_interval = sync_interval
+        self.refresh_interval = refresh_interval
+        self._revoked: Dict[str, float] = {}
+        self._refreshed_at = datetime.utcnow()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: str) -> bool:
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    async def revoke(self, db, jti: str, exp: float):
+        if exp <= time.time():
+            # Already expired, it can't validate anyway
+            return
+        await db.merge(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(exp), revoked_at=datetime.utcnow()))
+        await db.commit()
+        self._revoked[jti] = exp
+
+    async def refresh(self):
+        """Add the rows revoked since the previous refresh."""
+        started = datetime.utcnow()
+        async with self.read_session_factory() as db:
+            rows = (await db.execute(
+                select(RevokedToken.jti, RevokedToken.expires_at)
+                .where(RevokedToken.revoked_at > self._refreshed_at - REFRESH_OVERLAP)
+            )).all()
+        self._revoked.update((jti, _epoch(expires_at)) for jti, expires_at in rows)
+        self._refreshed_at = started
+
+    async def sync(self):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            await db.commit()
+            rows = (await db.execute(select(RevokedToken.jti, RevokedToken.expires_at))).all()
+        revoked = {jti: _epoch(expires_at) for jti, expires_at in rows}
+        # Keep local revocations committed after the SELECT above
+        cutoff = time.time()
+        revoked.update((jti, exp) for jti, exp in self._revoked.items() if exp > cutoff)
+        self._revoked = revoked
+        self._refreshed_at = now
+
+    async def _run(self):
+        synced = time.monotonic()
+        while True:
+            await asyncio.sleep(min(self.refresh_interval, self.sync_interval))
+            try:
+                if time.monotonic() - synced >= self.sync_interval:
+                    synced = time.monotonic()
+                    await self.sync()
+                else:
+                    await self.refresh()
+            except Exception as e:
+                logger.warning("Revocation sync failed: %s", e)
+
+    async def start(self):
+        await self.sync()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+revocations = RevocationStore(
+    AsyncSessionLocal, AsyncReadSessionLocal, REVOCATION_SYNC_SECONDS, REVOCATION_REFRESH_SECONDS
+)
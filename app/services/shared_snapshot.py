@@ -0,0 +1,260 @@
+"""Upstream snapshots shared by every worker through memory-mapped files.
+
+With SHARED_SNAPSHOT_DIR set, one worker per feed holds an exclusive
+flock on `<name>.lock` and is the only one that calls the upstream. It
+publishes each result as `<name>.snap`:
+
+    header   magic, format, version, published_at (epoch), metadata length
+    metadata JSON: caller metadata plus each column's name, dtype, shape, offset
+    columns  fixed-width NumPy arrays (numbers, indices, byte strings), 64-byte aligned
+
+The file is written to a temp file and renamed into place, so readers
+always see a complete snapshot. Other workers map it read-only, and the
+columns are `np.frombuffer` views into the mapping. A file is remapped
+only when its inode changes, and decoded only when its version does. If
+the leader exits, its lock is released and the next worker to try takes over.
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker fetches for itself
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHARED_SNAPSHOT_DIR = os.getenv("SHARED_SNAPSHOT_DIR", "")
+# How long a worker waits for the leader's first snapshot before giving up
+SHARED_SNAPSHOT_WAIT = float(os.getenv("SHARED_SNAPSHOT_WAIT", "10"))
+
+MAGIC = b"MSNP"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHQdI")  # magic, format, reserved, version, published_at, metadata length
+_ALIGN = 64
+
+Arrays = Dict[str, np.ndarray]
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_snapshot(path: str, version: int, arrays: Arrays, meta: dict, published_at: Optional[float] = None):
+    """Atomically replace `path` with a snapshot of `arrays`."""
+    columns = []
+    blobs = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = _aligned(offset)
+        columns.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        blobs.append((offset, array))
+        offset += array.nbytes
+    info = json.dumps({"meta": meta, "columns": columns}).encode()
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, version, time.time() if published_at is None else published_at, len(info))
+    data_start = _aligned(_HEADER.size + len(info))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(info)
+            for column_offset, array in blobs:
+                f.seek(data_start + column_offset)
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class MappedSnapshot:
+    """A published snapshot mapped into memory; `arrays` are read-only views of the mapping."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.key: Tuple[int, int] = (stat.st_ino, stat.st_mtime_ns)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, _, self.version, self.published_at, info_len = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a format {FORMAT_VERSION} snapshot")
+        info = json.loads(self._mmap[_HEADER.size:_HEADER.size + info_len])
+        self.meta: dict = info["meta"]
+        data_start = _aligned(_HEADER.size + info_len)
+        self.arrays: Arrays = {}
+        for column in info["columns"]:
+            dtype = np.dtype(column["dtype"])
+            shape = tuple(column["shape"])
+            count = int(np.prod(shape)) if shape else 1
+            self.arrays[column["name"]] = np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=data_start + column["offset"]
+            ).reshape(shape)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.published_at
+
+
+class SharedSnapshot:
+    """Wraps an upstream loader so that only the leader worker calls it.
+
+    `load` is meant to be a SnapshotCache loader: the leader fetches when the
+    published file is older than `interval` and publishes the result; everyone
+    else decodes the file, once per version. While the version is unchanged
+    `load` returns the very same object, which SnapshotCache takes as "no new
+    data" and keeps its own version. A background task keeps the file fresh
+    even when the leader itself gets no traffic.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        fetch: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Tuple[Arrays, dict]],
+        decode: Callable[[Arrays, dict], Any],
+        interval: float,
+    ):
+        self.name = name
+        self.directory = directory
+        self.path = os.path.join(directory, f"{name}.snap")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.fetch = fetch
+        self.encode = encode
+        self.decode = decode
+        self.interval = interval
+        self._lock_fd: Optional[int] = None
+        self._mapped: Optional[MappedSnapshot] = None
+        self._value: Any = None
+        self._value_version: Optional[int] = None
+        self._publish_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._directory_ready = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None or fcntl is None
+
+    def _try_lead(self) -> bool:
+        if self.is_leader:
+            return True
+        # Created here rather than at import, which must stay free of filesystem side effects
+        if not self._directory_ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_ready = True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        logger.info("Worker %s now publishes the %s snapshot", os.getpid(), self.name)
+        return True
+
+    def _map(self) -> Optional[MappedSnapshot]:
+        """The current file, remapped only if it has been replaced since the last call."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._mapped
+        if self._mapped is None or self._mapped.key != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                self._mapped = MappedSnapshot(self.path)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not map %s: %s", self.path, e)
+        return self._mapped
+
+    def _current(self) -> Any:
+        mapped = self._map()
+        if mapped is None:
+            return None
+        if mapped.version != self._value_version:
+            self._value = self.decode(mapped.arrays, mapped.meta)
+            self._value_version = mapped.version
+        return self._value
+
+    async def _fetch_and_publish(self) -> Any:
+        async with self._publish_lock:
+            mapped = self._map()
+            if mapped is not None and mapped.age < self.interval:
+                return self._current()
+            value = await self.fetch()
+            arrays, meta = self.encode(value)
+            version = (mapped.version if mapped is not None else 0) + 1
+            await asyncio.get_running_loop().run_in_executor(None, write_snapshot, self.path, version, arrays, meta)
+            # Serve what we just fetched; the file only matters to the other workers
+            self._mapped = self._map()
+            self._value, self._value_version = value, version
+            return value
+
+    async def load(self) -> Any:
+        if self._try_lead():
+            mapped = self._map()
+            if mapped is None or mapped.age >= self.interval:
+                return await self._fetch_and_publish()
+            return self._current()
+
+        deadline = time.monotonic() + SHARED_SNAPSHOT_WAIT
+        while True:
+            value = self._current()
+            if value is not None:
+                if self._mapped.age >= 2 * self.interval + SHARED_SNAPSHOT_WAIT:
+                    # The leader can't reach the upstream; let the cache fall back to stale data
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=f"The {self.name} snapshot is out of date"
+                    )
+                return value
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"No {self.name} snapshot published yet"
+                )
+            await asyncio.sleep(0.05)
+            if self._try_lead():
+                return await self._fetch_and_publish()
+
+    async def _run(self):
+        while True:
+            try:
+                if self._try_lead():
+                    await self._fetch_and_publish()
+            except Exception as e:
+                logger.warning("Publishing the %s snapshot failed: %s", self.name, e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def shared_loader(name: str, fetch, encode, decode, interval: float) -> Tuple[Callable[[], Awaitable[Any]], Optional[SharedSnapshot]]:
+    """`fetch` itself unless SHARED_SNAPSHOT_DIR is set, else a SharedSnapshot's `load`."""
+    if not SHARED_SNAPSHOT_DIR:
+        return fetch, None
+    shared = SharedSnapshot(name, SHARED_SNAPSHOT_DIR, fetch, encode, decode, interval)
+    return shared.load, shared
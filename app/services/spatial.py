@@ -0,0 +1,146 @@
+"""KD-tree over station coordinates for nearest-neighbour and bounding-box lookups."""
+import heapq
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Stations per leaf; leaves are scanned with one vectorized distance computation
+LEAF_SIZE = 8
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _meridian_km(lat: float, lon: float, meridian: float) -> float:
+    """Distance from (lat, lon) to the great circle through `meridian` and its antimeridian."""
+    delta = math.radians(abs(lon - meridian))
+    return EARTH_RADIUS_KM * math.asin(min(1.0, abs(math.cos(math.radians(lat)) * math.sin(delta))))
+
+
+def _plane_bound_km(lat: float, lon: float, dim: int, value: float) -> float:
+    """Lower bound on the distance from (lat, lon) to any point across a split line."""
+    if dim == 0:
+        # Along a meridian: the latitude difference alone
+        return EARTH_RADIUS_KM * math.radians(abs(lat - value))
+    # The other side is reached across the split meridian or across +/-180
+    return min(_meridian_km(lat, lon, value), _meridian_km(lat, lon, 180.0))
+
+
+class StationTree:
+    """Static KD-tree over (latitude, longitude), split on the wider axis at the median.
+
+    Nodes live in flat lists: an inner node has a split axis/value and two
+    children; a leaf covers a range of `order`, the station positions sorted
+    into tree order.
+    """
+
+    def __init__(self, ids: Sequence[str], lats: Sequence[float], lons: Sequence[float]):
+        self.ids = list(ids)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.order = np.arange(len(self.ids))
+        self._axis: List[int] = []
+        self._split: List[float] = []
+        self._children: List[Tuple[int, int]] = []
+        self._range: List[Tuple[int, int]] = []
+        self.root = self._build(0, len(self.ids)) if self.ids else -1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _node(self, axis: int, split: float, children: Tuple[int, int], span: Tuple[int, int]) -> int:
+        self._axis.append(axis)
+        self._split.append(split)
+        self._children.append(children)
+        self._range.append(span)
+        return len(self._axis) - 1
+
+    def _build(self, start: int, end: int) -> int:
+        members = self.order[start:end]
+        if end - start <= LEAF_SIZE:
+            return self._node(-1, 0.0, (-1, -1), (start, end))
+        lats, lons = self.lats[members], self.lons[members]
+        # Compare spreads in comparable units: a degree of longitude shrinks with cos(latitude)
+        lon_spread = np.ptp(lons) * math.cos(math.radians(float(np.mean(lats))))
+        axis = 0 if np.ptp(lats) >= lon_spread else 1
+        coords = lats if axis == 0 else lons
+        sorted_members = members[np.argsort(coords, kind="stable")]
+        self.order[start:end] = sorted_members
+        mid = (start + end) // 2
+        split = float((self.lats if axis == 0 else self.lons)[self.order[mid]])
+        node = self._node(axis, split, (-1, -1), (start, end))
+        self._children[node] = (self._build(start, mid), self._build(mid, end))
+        return node
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[float, int]]:
+        """Up to k (distance_km, station position) pairs, closest first."""
+        if self.root < 0 or k < 1:
+            return []
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, position)
+
+        def visit(node: int):
+            axis = self._axis[node]
+            if axis < 0:
+                start, end = self._range[node]
+                members = self.order[start:end]
+                for distance, position in zip(haversine_km(lat, lon, self.lats[members], self.lons[members]), members):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, int(position)))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, int(position)))
+                return
+            split = self._split[node]
+            left, right = self._children[node]
+            query = lat if axis == 0 else lon
+            near, far = (left, right) if query < split else (right, left)
+            visit(near)
+            if len(best) < k or _plane_bound_km(lat, lon, axis, split) < -best[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-d, p) for d, p in best)
+
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Station positions inside the box, in tree order."""
+        found: List[int] = []
+        if self.root < 0:
+            return found
+        low, high = (min_lat, min_lon), (max_lat, max_lon)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+            if axis < 0:
+                start, end = self._range[node]
+                members = self.order[start:end]
+                lats, lons = self.lats[members], self.lons[members]
+                inside = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+                found.extend(members[inside].tolist())
+                continue
+            split = self._split[node]
+            left, right = self._children[node]
+            # Points equal to the split value may sit on either side
+            if low[axis] <= split:
+                stack.append(left)
+            if high[axis] >= split:
+                stack.append(right)
+        return found
+
+
+def idw(distances_km: Sequence[float], values: Sequence[float], power: float = 2.0) -> Optional[float]:
+    """Inverse-distance-weighted mean; a station within 10 m is returned as is."""
+    if not values:
+        return None
+    distances = np.asarray(distances_km, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    exact = distances < 0.01
+    if exact.any():
+        return float(values[exact][0])
+    weights = 1.0 / distances ** power
+    return float(np.dot(weights, values) / weights.sum())
@@ -0,0 +1,49 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Wall-clock timings of each import and init step, from process start to ready.
+
+    Steps are recorded with `with report.step("name"): ...`; `finish` logs the
+    total and warns when it exceeds `budget` seconds.
+    """
+
+    def __init__(self, budget: float, started: Optional[float] = None):
+        self.budget = budget
+        self.started = time.perf_counter() if started is None else started
+        self.steps: List[Dict[str, object]] = []
+        self.ready_seconds: Optional[float] = None
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float):
+        self.steps.append({"step": name, "seconds": round(seconds, 6)})
+
+    def finish(self):
+        self.ready_seconds = time.perf_counter() - self.started
+        slowest = sorted(self.steps, key=lambda s: s["seconds"], reverse=True)[:3]
+        summary = ", ".join(f"{s['step']}={s['seconds']:.3f}s" for s in slowest)
+        if self.ready_seconds > self.budget:
+            logger.warning("Startup took %.3fs, over the %.3fs budget (slowest: %s)",
+                           self.ready_seconds, self.budget, summary)
+        else:
+            logger.info("Startup took %.3fs (slowest: %s)", self.ready_seconds, summary)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "ready_seconds": None if self.ready_seconds is None else round(self.ready_seconds, 6),
+            "budget_seconds": self.budget,
+            "over_budget": self.ready_seconds is not None and self.ready_seconds > self.budget,
+            "steps": self.steps,
+        }
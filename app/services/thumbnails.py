@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.models.photo import PhotoVariant
+from app.services.photo_storage import UPLOAD_DIR, UPLOAD_URL_PREFIX
+from app.services.user_cache import user_cache
+
+# Pillow is optional: without it uploads still work, only derivatives are skipped
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES: Tuple[int, ...] = tuple(
+    sorted(int(size) for size in os.getenv("THUMBNAIL_SIZES", "64,128,256").split(","))
+)
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp")
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+
+def _render_variants(source: str, sizes: Tuple[int, ...], image_format: str, quality: int) -> Dict[int, str]:
+    """Write one square, re-encoded derivative per size next to `source`.
+
+    Runs in a worker process. Returns {size: path relative to UPLOAD_DIR}.
+    """
+    stem, _ = os.path.splitext(source)
+    relative_stem = os.path.relpath(stem, UPLOAD_DIR)
+    written = {}
+    with Image.open(source) as image:
+        # Let JPEG decode at reduced scale when the source is much larger
+        image.draft("RGB", (sizes[-1] * 2, sizes[-1] * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for size in sizes:
+            target = f"{stem}_{size}.{image_format}"
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(target, quality=quality)
+            written[size] = f"{relative_stem}_{size}.{image_format}"
+    return written
+
+
+def source_path(photo_url: Optional[str]) -> Optional[str]:
+    """Local file behind an uploaded photo URL; None for external URLs."""
+    prefix = UPLOAD_URL_PREFIX + "/"
+    if not photo_url or not photo_url.startswith(prefix):
+        return None
+    return os.path.join(UPLOAD_DIR, photo_url[len(prefix):])
+
+
+async def load_variants(db, photo_url: Optional[str]) -> Dict[str, str]:
+    if source_path(photo_url) is None:
+        return {}
+    rows = await db.execute(select(PhotoVariant.size, PhotoVariant.url).where(PhotoVariant.photo_url == photo_url))
+    return {str(size): url for size, url in rows.all()}
+
+
+def pick_variant(photo_url: Optional[str], variants: Dict[str, str], size: int) -> Optional[str]:
+    """Smallest derivative at least `size` pixels wide, else the original."""
+    best = min((int(s) for s in variants if int(s) >= size), default=None)
+    if best is None:
+        return photo_url
+    return variants[str(best)]
+
+
+class ThumbnailPipeline:
+    """Generates photo derivatives in a process pool after an upload is accepted.
+
+    Work is fire-and-forget from the request's point of view; derivatives
+    are recorded in photo_variants once written and the cached profile of
+    every user who uploaded the photo meanwhile is dropped so the next read
+    picks them up. Content-addressed photos are processed once however many
+    users upload them.
+    """
+
+    def __init__(self, sizes: Tuple[int, ...], image_format: str, quality: int, workers: int):
+        self.sizes = sizes
+        self.image_format = image_format
+        self.quality = quality
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # photo_url -> emails of the users waiting on its derivatives
+        self._in_progress: Dict[str, Set[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return PILLOW_AVAILABLE and bool(self.sizes)
+
+    def start(self):
+        if self.enabled and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, photo_url: str, email: str):
+        if not self.enabled or source_path(photo_url) is None:
+            return
+        if photo_url in self._in_progress:
+            self._in_progress[photo_url].add(email)
+            return
+        self._in_progress[photo_url] = {email}
+        task = asyncio.create_task(self._process(photo_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, photo_url: str):
+        try:
+            # Sessions are opened only around the queries: the render must not hold a
+            # pooled connection, which with a single writer would block every other write
+            async with AsyncReadSessionLocal() as db:
+                if await load_variants(db, photo_url):
+                    return
+            self.start()
+            written = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _render_variants,
+                source_path(photo_url), self.sizes, self.image_format, self.quality
+            )
+            async with AsyncSessionLocal() as db:
+                for size, relative in written.items():
+                    db.add(PhotoVariant(photo_url=photo_url, size=size, url=f"{UPLOAD_URL_PREFIX}/{relative}"))
+                await db.commit()
+            for email in self._in_progress[photo_url]:
+                user_cache.invalidate(email=email)
+        except Exception as e:
+            logger.warning("Could not create derivatives for %s: %s", photo_url, e)
+        finally:
+            self._in_progress.pop(photo_url, None)
+
+
+thumbnails = ThumbnailPipeline(THUMBNAIL_SIZES, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY, THUMBNAIL_WORKERS)
@@ -0,0 +1,156 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TICKER_FIELDS = ("symbol", "lastPrice", "priceChangePercent", "volume", "highPrice", "lowPrice", "quoteVolume")
+NUMERIC_FIELDS = ("volume", "lastPrice", "priceChangePercent")
+
+
+class EncodedRows:
+    """Ticker rows backed by fixed-width byte columns, decoded one row at a time."""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = [(field, columns[field]) for field in TICKER_FIELDS]
+
+    def __len__(self) -> int:
+        return len(self.columns[0][1])
+
+    def __getitem__(self, position: int) -> Dict[str, str]:
+        return {field: column[position].decode() for field, column in self.columns}
+
+
+class TickerIndex:
+    """Columnar view of one 24hr ticker snapshot.
+
+    Numeric columns are parsed once when the snapshot is fetched and a
+    stable sort order is precomputed for every sortable field in both
+    directions, so a query only walks the presorted order until `limit`
+    rows pass the filters and only those rows are materialized.
+    """
+
+    def __init__(self, items: Iterable[Dict]):
+        records: List[Dict[str, str]] = []
+        numbers: List[tuple] = []
+        first_close_time = None
+        for position, item in enumerate(items):
+            if position == 0:
+                first_close_time = item.get("closeTime", "")
+            try:
+                parsed = tuple(float(item.get(field, 0)) for field in NUMERIC_FIELDS)
+            except (ValueError, TypeError) as e:
+                logger.warning("Skipping ticker %s: %s", item.get("symbol"), e)
+                continue
+            numbers.append(parsed)
+            records.append({field: item.get(field, "" if field == "symbol" else "0") for field in TICKER_FIELDS})
+
+        self.records = records
+        self.timestamp = "" if first_close_time is None else str(first_close_time)
+        columns = np.array(numbers, dtype=np.float64).reshape(len(numbers), len(NUMERIC_FIELDS))
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.ascontiguousarray(columns[:, i]) for i, field in enumerate(NUMERIC_FIELDS)
+        }
+        self.symbols_upper = np.array([r["symbol"].upper() for r in records], dtype=str)
+        # Upper-cased symbol -> row, for O(1) point lookups
+        self.by_symbol: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols_upper.tolist())}
+        # kind="stable" keeps upstream order for ties, like list.sort
+        self.orders: Dict[tuple, np.ndarray] = {}
+        for field, values in self.columns.items():
+            self.orders[(field, False)] = np.argsort(values, kind="stable")
+            self.orders[(field, True)] = np.argsort(-values, kind="stable")
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> "TickerIndex":
+        """Rebuild an index around columns from `to_arrays`, without copying them."""
+        index = cls.__new__(cls)
+        index.records = EncodedRows({field: arrays["text_" + field] for field in TICKER_FIELDS})
+        index.timestamp = meta["timestamp"]
+        index.columns = {field: arrays["num_" + field] for field in NUMERIC_FIELDS}
+        index.symbols_upper = arrays["symbols_upper"]
+        index.by_symbol = {symbol.decode(): i for i, symbol in enumerate(index.symbols_upper.tolist())}
+        index.orders = {
+            (field, descending): arrays[f"order_{field}_{'desc' if descending else 'asc'}"]
+            for field in NUMERIC_FIELDS for descending in (False, True)
+        }
+        return index
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """Fixed-width columns for a shared snapshot file; strings become UTF-8 byte columns."""
+        arrays: Dict[str, np.ndarray] = {}
+        for field in TICKER_FIELDS:
+            values = [str(self.records[i][field]).encode() for i in range(len(self))]
+            arrays["text_" + field] = np.array(values, dtype=bytes)
+        for field, values in self.columns.items():
+            arrays["num_" + field] = values
+        symbols = self.symbols_upper
+        arrays["symbols_upper"] = np.char.encode(symbols) if symbols.dtype.kind == "U" else symbols
+        for (field, descending), order in self.orders.items():
+            arrays[f"order_{field}_{'desc' if descending else 'asc'}"] = order.astype(np.int32)
+        return arrays, {"timestamp": self.timestamp}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, symbol: str) -> Optional[Dict[str, str]]:
+        position = self.by_symbol.get(symbol.upper())
+        return None if position is None else self.records[position]
+
+    def lookup(self, symbols: Iterable[str]) -> Tuple[List[Dict[str, str]], List[str]]:
+        """Rows for `symbols` in request order, plus the symbols not in the snapshot."""
+        found: List[Dict[str, str]] = []
+        missing: List[str] = []
+        for symbol in symbols:
+            position = self.by_symbol.get(symbol.upper())
+            if position is None:
+                missing.append(symbol)
+            else:
+                found.append(self.records[position])
+        return found, missing
+
+    def query(
+        self,
+        sort_by: str,
+        descending: bool,
+        limit: int,
+        min_volume: float = 0,
+        min_price: float = 0,
+        min_change: float = -100,
+        max_change: float = 100,
+        symbol_filter: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        order = self.orders[(sort_by, descending)]
+        needle = symbol_filter.upper() if symbol_filter else None
+        if needle and self.symbols_upper.dtype.kind == "S":
+            needle = needle.encode()
+        volume = self.columns["volume"]
+        price = self.columns["lastPrice"]
+        change = self.columns["priceChangePercent"]
+
+        def matches(idx: np.ndarray) -> np.ndarray:
+            mask = (change[idx] >= min_change) & (change[idx] <= max_change)
+            if min_volume > 0:
+                mask &= volume[idx] >= min_volume
+            if min_price > 0:
+                mask &= price[idx] >= min_price
+            if needle:
+                mask &= np.char.find(self.symbols_upper[idx], needle) >= 0
+            return mask
+
+        # Scan the presorted order in growing chunks and stop once enough rows match
+        selected: List[np.ndarray] = []
+        found = 0
+        start = 0
+        chunk = max(limit * 4, 256)
+        while start < len(order) and found < limit:
+            idx = order[start:start + chunk]
+            hits = idx[matches(idx)]
+            selected.append(hits)
+            found += len(hits)
+            start += chunk
+            chunk *= 2
+
+        if not selected:
+            return []
+        return [self.records[i] for i in np.concatenate(selected)[:limit]]
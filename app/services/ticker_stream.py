@@ -0,0 +1,183 @@
+"""Fan-out of ticker snapshot updates to server-sent-event subscribers.
+
+One poller reads the shared ticker snapshot cache, whose TTL decides when
+the upstream is hit. Subscribers are grouped by their query parameters,
+and each group runs its query and builds its diff
+once per snapshot version. The encoded message is then shared by every
+subscriber in the group.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.services.cache import Snapshot, SnapshotCache
+from app.services.metrics import registry
+from app.services.responses import dumps
+from app.services.ticker_index import TickerIndex
+
+logger = logging.getLogger(__name__)
+
+QueryKey = Tuple
+
+
+def _event(name: str, payload: dict) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+
+
+class Subscriber:
+    def __init__(self, group: "StreamGroup", queue_size: int):
+        self.group = group
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message: Optional[bytes]) -> bool:
+        """Queue a message; False if the queue is full."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def resync(self):
+        """Drop the backlog and start over from the group's full state."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        ticker_stream_resyncs.inc()
+        self.push(self.group.full_message())
+
+
+class StreamGroup:
+    """Subscribers sharing one set of query parameters, and their last result."""
+
+    def __init__(self, key: QueryKey, params: dict):
+        self.key = key
+        self.params = params
+        self.subscribers: Set[Subscriber] = set()
+        self.version: Optional[int] = None
+        self.timestamp = ""
+        self.order: List[str] = []
+        self.rows: Dict[str, dict] = {}
+        self._full: Optional[bytes] = None
+
+    def update(self, index: TickerIndex, version: int) -> Optional[bytes]:
+        """Re-run the query for a new snapshot; returns the diff message, or None if nothing changed."""
+        rows = index.query(**self.params)
+        order = [row["symbol"] for row in rows]
+        current = {row["symbol"]: row for row in rows}
+        changed = [row for row in rows if self.rows.get(row["symbol"]) != row]
+        removed = [symbol for symbol in self.order if symbol not in current]
+        first = self.version is None
+        order_changed = order != self.order
+        self.version, self.timestamp, self.order, self.rows = version, index.timestamp, order, current
+        self._full = None
+        if first or not (changed or removed or order_changed):
+            return None
+        diff = {"version": version, "timestamp": index.timestamp, "changed": changed, "removed": removed}
+        if order_changed:
+            diff["order"] = order
+        return _event("diff", diff)
+
+    def full_message(self) -> bytes:
+        if self._full is None:
+            self._full = _event("snapshot", {
+                "version": self.version,
+                "timestamp": self.timestamp,
+                "data": [self.rows[symbol] for symbol in self.order],
+            })
+        return self._full
+
+
+class TickerHub:
+    """Polls the ticker snapshot while anyone is subscribed and pushes per-group diffs.
+
+    Each subscriber has a bounded queue. A subscriber that falls behind
+    loses its backlog and gets a fresh full snapshot instead of stalling
+    the others.
+    """
+
+    def __init__(self, cache: SnapshotCache, poll_interval: float, queue_size: int, heartbeat: float):
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._groups: Dict[QueryKey, StreamGroup] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(group.subscribers) for group in self._groups.values())
+
+    def subscribe(self, key: QueryKey, params: dict, snapshot: Snapshot) -> Subscriber:
+        """Join the group for `params`, starting from `snapshot` (fetched by the caller)."""
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = StreamGroup(key, params)
+        # A caller that fetched before the poller's last publish must not roll the group back;
+        # it simply starts from the group's current state
+        if group.version is None or snapshot.version > group.version:
+            self._publish(group, snapshot.value, snapshot.version)
+        subscriber = Subscriber(group, self.queue_size)
+        group.subscribers.add(subscriber)
+        subscriber.push(group.full_message())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        group = subscriber.group
+        group.subscribers.discard(subscriber)
+        if not group.subscribers and self._groups.get(group.key) is group:
+            del self._groups[group.key]
+
+    async def events(self, key: QueryKey, params: dict, snapshot: Snapshot) -> AsyncIterator[bytes]:
+        """The subscriber's messages. The route fetches `snapshot` before the response
+        starts, so an upstream failure is still a proper error status."""
+        subscriber = self.subscribe(key, params, snapshot)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _publish(self, group: StreamGroup, index: TickerIndex, version: int):
+        message = group.update(index, version)
+        if message is None:
+            return
+        for subscriber in list(group.subscribers):
+            if not subscriber.push(message):
+                subscriber.resync()
+
+    async def _poll(self):
+        while self._groups:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                # The cache's TTL (or the shared snapshot) decides when upstream is hit
+                snapshot = await self.cache.get()
+            except Exception as e:
+                logger.warning("Ticker stream refresh failed: %s", e)
+                continue
+            for group in list(self._groups.values()):
+                if group.version != snapshot.version:
+                    self._publish(group, snapshot.value, snapshot.version)
+
+    async def stop(self):
+        for group in list(self._groups.values()):
+            for subscriber in list(group.subscribers):
+                if not subscriber.push(None):
+                    subscriber.queue.get_nowait()
+                    subscriber.push(None)
+        self._groups.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+ticker_stream_resyncs = registry.counter(
+    "ticker_stream_resyncs_total", "Stream subscribers that fell behind and were sent a full snapshot"
+)
@@ -0,0 +1,85 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from app.models.user import User
+from app.services.cache import TTLCache
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Plain, immutable copy of the profile columns of a User row.
+
+    Never holds the ORM instance, so nothing cached is tied to a session,
+    and never holds the password hash.
+    """
+
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    bio: Optional[str] = None
+    phone: Optional[str] = None
+    photo_url: Optional[str] = None
+    facebook_id: Optional[str] = None
+    # {size: url} of derivatives generated for photo_url
+    photo_variants: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_user(cls, user: User, photo_variants: Optional[Dict[str, str]] = None) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            bio=user.bio,
+            phone=user.phone,
+            photo_url=user.photo_url,
+            facebook_id=user.facebook_id,
+            photo_variants=dict(photo_variants or {}),
+        )
+
+
+class UserCache:
+    """Read-through profile cache keyed by both email and id.
+
+    Writers call `put` after committing so readers see their change
+    immediately in this worker; other workers pick it up within the TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._by_email = TTLCache(maxsize, ttl, name="users")
+        self._by_id = TTLCache(maxsize, ttl, name="users")
+
+    def get_by_email(self, email: str) -> Optional[CachedUser]:
+        return self._by_email.get(email)
+
+    def get_by_id(self, user_id: int) -> Optional[CachedUser]:
+        return self._by_id.get(user_id)
+
+    def put(self, user: User, photo_variants: Optional[Dict[str, str]] = None) -> CachedUser:
+        entry = CachedUser.from_user(user, photo_variants)
+        previous = self._by_id.peek(entry.id)
+        if previous is not None and previous.email != entry.email:
+            self._by_email.pop(previous.email)
+        self._by_email.set(entry.email, entry)
+        self._by_id.set(entry.id, entry)
+        return entry
+
+    def invalidate(self, email: Optional[str] = None, user_id: Optional[int] = None):
+        if email is not None:
+            entry = self._by_email.pop(email)
+            if entry is not None:
+                self._by_id.pop(entry.id)
+        if user_id is not None:
+            entry = self._by_id.pop(user_id)
+            if entry is not None:
+                self._by_email.pop(entry.email)
+
+    def clear(self):
+        self._by_email.clear()
+        self._by_id.clear()
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
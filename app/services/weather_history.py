@@ -0,0 +1,187 @@
+"""Append-only history of station readings in a WAL-mode SQLite file.
+
+A background ingester writes every new air-temperature snapshot; range
+queries are aggregated into at most `points` min/max/avg buckets inside
+SQLite, so a large window costs one index range scan and a bounded payload.
+"""
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.services.weather_snapshot import weather_snapshots
+
+logger = logging.getLogger(__name__)
+
+WEATHER_HISTORY_DB = os.getenv("WEATHER_HISTORY_DB", "weather_history.db")
+# Seconds between ingester passes; the snapshot cache decides when upstream is actually hit
+WEATHER_INGEST_INTERVAL = float(os.getenv("WEATHER_INGEST_INTERVAL", "60"))
+# Readings older than this are deleted by the ingester; 0 keeps everything
+WEATHER_HISTORY_RETENTION_DAYS = float(os.getenv("WEATHER_HISTORY_RETENTION_DAYS", "90"))
+WEATHER_HISTORY_READERS = int(os.getenv("WEATHER_HISTORY_READERS", "2"))
+# Pruning scans the table (ts is not the leading key column), so it runs at most this often
+PRUNE_INTERVAL_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    station_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (station_id, ts)
+) WITHOUT ROWID
+"""
+
+
+def _epoch(timestamp: str) -> int:
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+
+class WeatherHistory:
+    """SQLite-backed (station_id, ts) -> value store.
+
+    All writes go through one connection on one thread; reads use a small
+    pool of per-thread connections, which WAL lets run alongside the writer.
+    """
+
+    def __init__(self, path: str, ingest_interval: float, retention_days: float, readers: int):
+        self.path = path
+        self.ingest_interval = ingest_interval
+        self.retention_days = retention_days
+        self.readers = readers
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        # Every connection opened, so stop() can close them once the threads are gone
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._ingested_version: Optional[int] = None
+        self._pruned_at = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only ever used by its own thread; closed from stop() after that thread has exited
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _executors(self):
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weather-history-writer")
+            self._readers = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="weather-history-reader")
+        return self._writer, self._readers
+
+    async def _write(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executors()[0], fn, *args)
+
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executors()[1], fn, *args)
+
+    def _insert(self, rows: List[tuple]) -> int:
+        conn = self._connection()
+        with conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO readings (station_id, ts, value) VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def _prune(self, cutoff: int) -> int:
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM readings WHERE ts < ?", (cutoff,)).rowcount
+
+    def _query(self, station_id: str, start: int, end: int, step: int) -> List[tuple]:
+        return self._connection().execute(
+            """
+            SELECT (ts - :start) / :step AS bucket, MIN(value), MAX(value), AVG(value), COUNT(*)
+            FROM readings
+            WHERE station_id = :station AND ts >= :start AND ts < :end
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            {"station": station_id, "start": start, "end": end, "step": step},
+        ).fetchall()
+
+    async def add(self, timestamp: str, readings: List[dict]) -> int:
+        ts = _epoch(timestamp)
+        rows = [(r["station_id"], ts, float(r["value"])) for r in readings if r.get("value") is not None]
+        return await self._write(self._insert, rows) if rows else 0
+
+    async def history(self, station_id: str, start: int, end: int, points: int) -> Dict[str, object]:
+        """Readings in [start, end) as at most `points` buckets of min/max/avg/count."""
+        step = max(1, math.ceil((end - start) / points))
+        rows = await self._read(self._query, station_id, start, end, step)
+        return {
+            "station_id": station_id,
+            "start": start,
+            "end": end,
+            "bucket_seconds": step,
+            "timestamps": [start + bucket * step for bucket, *_ in rows],
+            "min": [row[1] for row in rows],
+            "max": [row[2] for row in rows],
+            "avg": [row[3] for row in rows],
+            "count": [row[4] for row in rows],
+        }
+
+    async def ingest_once(self):
+        snapshot = await weather_snapshots.get()
+        if snapshot.version == self._ingested_version:
+            return
+        index = snapshot.value
+        if index.timestamp:
+            await self.add(index.timestamp, index.current["readings"])
+        self._ingested_version = snapshot.version
+        now = time.time()
+        if self.retention_days > 0 and now - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+            self._pruned_at = now
+            await self._write(self._prune, int(now - self.retention_days * 86400))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.ingest_once()
+            except Exception as e:
+                logger.warning("Weather history ingest failed: %s", e)
+            await asyncio.sleep(self.ingest_interval)
+
+    async def start(self):
+        await self._write(self._connection)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop ingesting, let queued queries finish, then release the threads and connections."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        executors = [e for e in (self._writer, self._readers) if e is not None]
+        self._writer = self._readers = None
+        loop = asyncio.get_running_loop()
+        for executor in executors:
+            await loop.run_in_executor(None, executor.shutdown)
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+weather_history = WeatherHistory(
+    WEATHER_HISTORY_DB, WEATHER_INGEST_INTERVAL, WEATHER_HISTORY_RETENTION_DAYS, WEATHER_HISTORY_READERS
+)
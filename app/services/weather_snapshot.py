@@ -0,0 +1,131 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.services.cache import SnapshotCache
+from app.services.http_clients import DATA_GOV_SG, clients
+from app.services.shared_snapshot import shared_loader
+from app.services.spatial import StationTree
+
+AIR_TEMPERATURE_PATH = "/v1/environment/air-temperature"
+
+# data.gov.sg publishes a new air-temperature reading about once a minute
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "60"))
+WEATHER_CACHE_MAX_STALE = float(os.getenv("WEATHER_CACHE_MAX_STALE", "60"))
+# After that, the last snapshot still stands in while data.gov.sg is failing or its breaker is open
+WEATHER_CACHE_STALE_IF_ERROR = float(os.getenv("WEATHER_CACHE_STALE_IF_ERROR", "3600"))
+
+
+class WeatherSnapshot:
+    """One air-temperature document, indexed once when it is fetched.
+
+    Stations are keyed by id and every reading is joined with its station's
+    metadata up front, so requests never scan the station list. The spatial
+    index is carried over from `previous` while the station list is unchanged.
+    """
+
+    def __init__(self, document: dict, previous: Optional["WeatherSnapshot"] = None):
+        self.station_list: List[dict] = document.get("metadata", {}).get("stations", [])
+        self.stations: Dict[str, dict] = {station["id"]: station for station in self.station_list}
+        self.fingerprint = tuple(
+            (s["id"], s["location"]["latitude"], s["location"]["longitude"]) for s in self.station_list
+        )
+        if previous is not None and previous.fingerprint == self.fingerprint:
+            self.tree = previous.tree
+        else:
+            self.tree = StationTree(
+                [f[0] for f in self.fingerprint], [f[1] for f in self.fingerprint], [f[2] for f in self.fingerprint]
+            )
+        items = document.get("items") or [{}]
+        self.current: dict = {"timestamp": items[0].get("timestamp", ""), "readings": items[0].get("readings", [])}
+        self.timestamp: str = self.current["timestamp"]
+        self.readings: Dict[str, dict] = {reading["station_id"]: reading for reading in self.current["readings"]}
+        # Stations a nearest search may have to skip; readings for unknown station ids don't offset them
+        self.stations_without_reading = sum(1 for station_id in self.tree.ids if station_id not in self.readings)
+        # Readings joined with station metadata, in upstream reading order
+        self.rows: List[dict] = []
+        for reading in self.current["readings"]:
+            station = self.stations.get(reading["station_id"])
+            if station is not None:
+                self.rows.append({
+                    "station_id": reading["station_id"],
+                    "station_name": station["name"],
+                    "location": station["location"],
+                    "temperature": reading["value"],
+                })
+
+    def station(self, station_id: str) -> Optional[dict]:
+        return self.stations.get(station_id)
+
+    def reading(self, station_id: str) -> Optional[dict]:
+        return self.readings.get(station_id)
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """Station and reading columns for a shared snapshot file; missing values become NaN."""
+        def text(values):
+            return np.array([str(v).encode() for v in values], dtype=bytes)
+
+        readings = self.current["readings"]
+        arrays = {
+            "station_id": text(s["id"] for s in self.station_list),
+            "device_id": text(s.get("device_id", s["id"]) for s in self.station_list),
+            "name": text(s["name"] for s in self.station_list),
+            "latitude": np.array([s["location"]["latitude"] for s in self.station_list], dtype=np.float64),
+            "longitude": np.array([s["location"]["longitude"] for s in self.station_list], dtype=np.float64),
+            "reading_station_id": text(r["station_id"] for r in readings),
+            "reading_value": np.array(
+                [np.nan if r.get("value") is None else r["value"] for r in readings], dtype=np.float64
+            ),
+        }
+        return arrays, {"timestamp": self.timestamp}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict,
+                    previous: Optional["WeatherSnapshot"] = None) -> "WeatherSnapshot":
+        stations = [
+            {
+                "id": station_id.decode(),
+                "device_id": device_id.decode(),
+                "name": name.decode(),
+                "location": {"latitude": latitude, "longitude": longitude},
+            }
+            for station_id, device_id, name, latitude, longitude in zip(
+                arrays["station_id"].tolist(), arrays["device_id"].tolist(), arrays["name"].tolist(),
+                arrays["latitude"].tolist(), arrays["longitude"].tolist()
+            )
+        ]
+        readings = [
+            {"station_id": station_id.decode(), "value": None if value != value else value}
+            for station_id, value in zip(arrays["reading_station_id"].tolist(), arrays["reading_value"].tolist())
+        ]
+        document = {"metadata": {"stations": stations}, "items": [{"timestamp": meta["timestamp"], "readings": readings}]}
+        return cls(document, previous)
+
+
+def _previous() -> Optional[WeatherSnapshot]:
+    previous = weather_snapshots.snapshot
+    return previous.value if previous is not None else None
+
+
+async def fetch_weather_snapshot() -> WeatherSnapshot:
+    response = await clients.get(DATA_GOV_SG).get(AIR_TEMPERATURE_PATH)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch weather data")
+    return WeatherSnapshot(response.json(), _previous())
+
+
+# With SHARED_SNAPSHOT_DIR set, one worker fetches and the rest map its published file
+load_weather_snapshot, shared_weather = shared_loader(
+    "weather",
+    fetch_weather_snapshot,
+    encode=WeatherSnapshot.to_arrays,
+    decode=lambda arrays, meta: WeatherSnapshot.from_arrays(arrays, meta, _previous()),
+    interval=WEATHER_CACHE_TTL,
+)
+
+weather_snapshots = SnapshotCache(
+    load_weather_snapshot, ttl=WEATHER_CACHE_TTL, max_stale=WEATHER_CACHE_MAX_STALE, name="weather",
+    stale_if_error=WEATHER_CACHE_STALE_IF_ERROR
+)
@@ -0,0 +1,168 @@
+"""End-to-end load driver reporting req/s and latency percentiles per route.
+
+Fully offline, against local stub upstreams:
+
+    python -m benchmarks.load --spawn --concurrency 32 --duration 10
+
+Or against an already running instance:
+
+    python -m benchmarks.load --target http://127.0.0.1:8008
+
+--spawn starts benchmarks.stub_upstreams and the app under uvicorn with a
+scratch database and upload directory, so nothing outside /tmp is touched.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import payloads
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+@contextmanager
+def spawned_stack(args):
+    scratch = tempfile.mkdtemp(prefix="bench-load-")
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    env = dict(
+        os.environ,
+        BINANCE_BASE_URL=stub_url,
+        DATA_GOV_SG_BASE_URL=stub_url,
+        DATABASE_URL=f"sqlite:///{scratch}/app.db",
+        UPLOAD_DIR=f"{scratch}/uploads",
+        WEATHER_HISTORY_DB=f"{scratch}/weather_history.db",
+    )
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_upstreams", "--port", str(stub_port),
+        "--latency-ms", str(args.upstream_latency_ms), "--symbols", str(args.symbols),
+    ])
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ], env=env)
+    try:
+        wait_until_up(f"{stub_url}/_stats")
+        wait_until_up(f"http://127.0.0.1:{app_port}/")
+        yield f"http://127.0.0.1:{app_port}", stub_url
+    finally:
+        for process in (app, stub):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/auth/register", json={"email": email, "password": "bench-password"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def drive(client: httpx.AsyncClient, method: str, path: str, headers: Dict, body: Optional[dict],
+                concurrency: int, duration: float) -> Tuple[List[float], Dict[int, int], float]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, data=body)
+                code = response.status_code
+            except httpx.HTTPError:
+                code = 0
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def run(target: str, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=60.0) as client:
+        token = await get_token(client)
+        auth = {"Authorization": f"Bearer {token}"}
+        symbol = args.symbol or payloads.ticker_24hr(args.symbols)[0]["symbol"]
+        routes = [
+            ("GET", "/crypto/tickers?limit=10&sort_by=volume", auth, None),
+            ("GET", "/crypto/tickers?limit=50&min_volume=1000&symbol_filter=USDT", auth, None),
+            ("GET", f"/crypto/ticker/{symbol}", auth, None),
+            ("GET", f"/crypto/chart/{symbol}?interval=1h&limit=24", auth, None),
+            ("GET", "/weather/temperature", auth, None),
+            ("GET", "/users/profile", auth, None),
+        ]
+        if args.include_login:
+            email = f"bench-login-{uuid.uuid4().hex[:8]}@example.com"
+            await client.post("/auth/register", json={"email": email, "password": "bench-password"})
+            routes.append(("POST", "/auth/login", {}, {"username": email, "password": "bench-password"}))
+
+        print(f"{'route':<64} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  status")
+        for method, path, headers, body in routes:
+            if args.warmup:
+                await drive(client, method, path, headers, body, args.concurrency, args.warmup)
+            latencies, statuses, elapsed = await drive(client, method, path, headers, body, args.concurrency, args.duration)
+            latencies.sort()
+            print(f"{method + ' ' + path:<64} {len(latencies) / elapsed:>9.1f} "
+                  f"{statistics.median(latencies) * 1000:>8.2f} {percentile(latencies, 0.90) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {latencies[-1] * 1000:>8.2f}  {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="base URL of a running instance")
+    parser.add_argument("--spawn", action="store_true", help="start stub upstreams and the app locally")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per route")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds per route before measuring")
+    parser.add_argument("--upstream-latency-ms", type=float, default=30.0)
+    parser.add_argument("--symbols", type=int, default=3000)
+    parser.add_argument("--symbol", help="symbol for the ticker/chart routes (default: first in the feed)")
+    parser.add_argument("--include-login", action="store_true", help="also load POST /auth/login (bcrypt)")
+    args = parser.parse_args()
+
+    if args.spawn:
+        with spawned_stack(args) as (target, stub_url):
+            asyncio.run(run(target, args))
+            print(f"upstream requests served by stub: {httpx.get(f'{stub_url}/_stats').json()['requests']}")
+    elif args.target:
+        asyncio.run(run(args.target, args))
+    else:
+        parser.error("pass --spawn or --target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Microbenchmarks for the hot paths, no network needed.
+
+    python -m benchmarks.micro [--symbols 3000] [--only tickers,jwt]
+
+Covers the /crypto/tickers filter/sort path (legacy per-request loop vs the
+columnar TickerIndex), bcrypt hashing, JWT encode/decode and the
+authentication dependency, and profile queries against a scratch SQLite DB.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from benchmarks import payloads
+
+
+def measure(fn: Callable, repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def ameasure(fn: Callable, repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name: str, samples: List[float]):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<48} n={len(samples):<6} mean={statistics.mean(samples) * 1e6:>11.1f}us "
+          f"p50={statistics.median(samples) * 1e6:>11.1f}us p99={p99 * 1e6:>11.1f}us")
+
+
+def legacy_filter_sort(data, limit=10, min_volume=0.0, symbol_filter=None, sort_field="volume"):
+    """The original get_all_tickers loop, kept as the baseline."""
+    from app.routers.crypto import CryptoTicker
+    filtered = []
+    for item in data:
+        try:
+            price_change = float(item.get("priceChangePercent", 0))
+            volume = float(item.get("volume", 0))
+            if min_volume > 0 and volume < min_volume or price_change < -100 or price_change > 100:
+                continue
+            if symbol_filter and symbol_filter.upper() not in item.get("symbol", "").upper():
+                continue
+            filtered.append(CryptoTicker(**{k: item.get(k, "0") for k in CryptoTicker.model_fields}))
+        except (ValueError, KeyError):
+            continue
+    filtered.sort(key=lambda x: float(getattr(x, sort_field)), reverse=True)
+    return filtered[:limit]
+
+
+def bench_tickers(args):
+    from app.routers.crypto import CryptoTicker
+    from app.services.ticker_index import TickerIndex
+
+    data = payloads.ticker_24hr(args.symbols)
+    report(f"tickers: legacy loop ({len(data)} symbols)", measure(lambda: legacy_filter_sort(data), args.repeat // 10 or 1))
+    report("tickers: TickerIndex build (once per snapshot)", measure(lambda: TickerIndex(data), args.repeat // 10 or 1))
+    index = TickerIndex(data)
+
+    def query(**kwargs):
+        return [CryptoTicker(**row) for row in index.query(sort_by="volume", descending=True, limit=10, **kwargs)]
+
+    report("tickers: index query, no filter", measure(query, args.repeat))
+    report("tickers: index query, min_volume", measure(lambda: query(min_volume=1e6), args.repeat))
+    report("tickers: index query, symbol_filter", measure(lambda: query(symbol_filter="btc"), args.repeat))
+
+
+def bench_bcrypt(args):
+    from app.services.hashing import hasher, _hash, _verify
+
+    hashed = _hash("correct horse battery staple")
+    report("bcrypt: hash", measure(lambda: _hash("correct horse battery staple"), 5))
+    report("bcrypt: verify", measure(lambda: _verify("correct horse battery staple", hashed), 5))
+
+    async def concurrent():
+        hasher.start()
+        started = time.perf_counter()
+        await asyncio.gather(*[hasher.verify("correct horse battery staple", hashed) for _ in range(16)])
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(concurrent())
+    print(f"{'bcrypt: 16 concurrent verifies via hasher':<48} total={elapsed * 1000:.1f}ms ({hasher.workers} workers)")
+    hasher.shutdown()
+
+
+def bench_jwt(args):
+    from jose import jwt
+    from app.routers.auth import ALGORITHM, SECRET_KEY, create_access_token, get_current_user, verified_tokens
+
+    token = create_access_token({"sub": "bench@example.com"})
+    report("jwt: encode", measure(lambda: create_access_token({"sub": "bench@example.com"}), args.repeat))
+    report("jwt: decode + verify", measure(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), args.repeat))
+
+    async def run():
+        verified_tokens.clear()
+        report("jwt: get_current_user (cached claims)", await ameasure(lambda: get_current_user(token), args.repeat))
+
+    asyncio.run(run())
+
+
+def bench_profile(args):
+    # The engines are built at import time, so point them at a scratch DB first
+    scratch = tempfile.mkdtemp(prefix="bench-db-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal
+    from app.migrations import run_migrations
+    from app.models.user import User
+    from app.services.user_cache import user_cache
+
+    run_migrations()
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            db.add_all([User(email=f"user{i}@example.com", full_name=f"User {i}") for i in range(1000)])
+            await db.commit()
+
+        async def query():
+            async with AsyncSessionLocal() as db:
+                return (await db.execute(select(User).where(User.email == "user500@example.com"))).scalars().first()
+
+        report("profile: SELECT by email (async SQLite)", await ameasure(query, args.repeat // 10 or 1))
+        user_cache.put(await query())
+        report("profile: user cache hit", measure(lambda: user_cache.get_by_email("user500@example.com"), args.repeat))
+
+    asyncio.run(run())
+
+
+BENCHMARKS = {"tickers": bench_tickers, "bcrypt": bench_bcrypt, "jwt": bench_jwt, "profile": bench_profile}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="comma-separated subset of " + ", ".join(BENCHMARKS))
+    args = parser.parse_args()
+    # Ordered so DATABASE_URL is set before anything imports app.database
+    selected = [name for name in ["profile", "tickers", "bcrypt", "jwt"] if name in args.only.split(",")]
+    if "profile" not in selected:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-db-')}/bench.db")
+    for name in selected:
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Upstream payloads for the benchmarks.
+
+Recorded responses are read from benchmarks/data/<name>.json when present
+(see `python -m benchmarks.record`); otherwise payloads with the same shape
+are generated deterministically, with configurable size.
+"""
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def load_recorded(name: str) -> Optional[object]:
+    path = os.path.join(DATA_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def ticker_24hr(symbols: int = 3000, seed: int = 42) -> List[Dict]:
+    recorded = load_recorded("ticker_24hr")
+    if recorded is not None:
+        return recorded
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    quotes = ["USDT", "BTC", "ETH", "BNB", "FDUSD", "TRY"]
+    tickers = []
+    for i in range(symbols):
+        price = 10 ** rng.uniform(-6, 5)
+        change = rng.uniform(-30, 30)
+        volume = 10 ** rng.uniform(0, 9)
+        tickers.append({
+            "symbol": f"C{i:04d}{quotes[i % len(quotes)]}",
+            "priceChange": f"{price * change / 100:.8f}",
+            "priceChangePercent": f"{change:.3f}",
+            "weightedAvgPrice": f"{price:.8f}",
+            "prevClosePrice": f"{price:.8f}",
+            "lastPrice": f"{price:.8f}",
+            "lastQty": "1.00000000",
+            "bidPrice": f"{price * 0.999:.8f}",
+            "bidQty": "10.00000000",
+            "askPrice": f"{price * 1.001:.8f}",
+            "askQty": "10.00000000",
+            "openPrice": f"{price:.8f}",
+            "highPrice": f"{price * 1.05:.8f}",
+            "lowPrice": f"{price * 0.95:.8f}",
+            "volume": f"{volume:.8f}",
+            "quoteVolume": f"{volume * price:.8f}",
+            "openTime": now - 86_400_000,
+            "closeTime": now,
+            "firstId": i * 1000,
+            "lastId": i * 1000 + 999,
+            "count": 1000,
+        })
+    return tickers
+
+
+def klines(limit: int, interval_ms: int = 3_600_000, start_time: Optional[int] = None, seed: int = 7) -> List[list]:
+    """Candles aligned to `interval_ms`, ending with the currently open one."""
+    now = int(time.time() * 1000) // interval_ms * interval_ms
+    first = start_time // interval_ms * interval_ms if start_time is not None else now - (limit - 1) * interval_ms
+    rng = random.Random(seed)
+    rows = []
+    for open_time in range(first, now + 1, interval_ms):
+        if len(rows) >= limit:
+            break
+        base = 100 + 10 * ((open_time // interval_ms) % 37) / 37 + rng.random()
+        rows.append([
+            open_time, f"{base:.2f}", f"{base * 1.01:.2f}", f"{base * 0.99:.2f}", f"{base + rng.uniform(-1, 1):.2f}",
+            "1000.0", open_time + interval_ms - 1, "100000.0", 100, "500.0", "50000.0", "0",
+        ])
+    return rows
+
+
+def air_temperature(stations: int = 15, seed: int = 3) -> Dict:
+    recorded = load_recorded("air_temperature")
+    if recorded is not None:
+        return recorded
+    rng = random.Random(seed)
+    metadata = [
+        {
+            "id": f"S{100 + i}",
+            "device_id": f"S{100 + i}",
+            "name": f"Station {i}",
+            "location": {"latitude": round(1.25 + rng.random() * 0.2, 4), "longitude": round(103.65 + rng.random() * 0.35, 4)},
+        }
+        for i in range(stations)
+    ]
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:00+08:00", time.gmtime(time.time() + 8 * 3600))
+    return {
+        "metadata": {"stations": metadata, "reading_type": "DBT 1M F", "reading_unit": "deg C"},
+        "items": [{
+            "timestamp": timestamp,
+            "readings": [{"station_id": s["id"], "value": round(24 + rng.random() * 8, 1)} for s in metadata],
+        }],
+        "api_info": {"status": "healthy"},
+    }
@@ -0,0 +1,31 @@
+"""Record live upstream payloads into benchmarks/data for offline replay.
+
+    python -m benchmarks.record
+"""
+import json
+import os
+
+import httpx
+
+from benchmarks.payloads import DATA_DIR
+
+SOURCES = {
+    "ticker_24hr": "https://api.binance.com/api/v3/ticker/24hr",
+    "air_temperature": "https://api.data.gov.sg/v1/environment/air-temperature",
+}
+
+
+def main():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with httpx.Client(timeout=30.0) as client:
+        for name, url in SOURCES.items():
+            response = client.get(url)
+            response.raise_for_status()
+            path = os.path.join(DATA_DIR, f"{name}.json")
+            with open(path, "w") as f:
+                json.dump(response.json(), f)
+            print(f"{name}: {len(response.content)} bytes -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Local stand-ins for api.binance.com and api.data.gov.sg.
+
+    python -m benchmarks.stub_upstreams --port 9100 --latency-ms 40 --symbols 3000
+
+Point the app at it with BINANCE_BASE_URL=http://127.0.0.1:9100 and
+DATA_GOV_SG_BASE_URL=http://127.0.0.1:9100. Payloads are encoded once at
+startup so the stub itself stays cheap compared to the service under test.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.services.klines import INTERVAL_MS, MAX_KLINES
+from benchmarks import payloads
+
+
+def create_stub_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, symbols: int = 3000, stations: int = 15) -> Starlette:
+    tickers = payloads.ticker_24hr(symbols)
+    tickers_body = json.dumps(tickers).encode()
+    by_symbol = {t["symbol"]: json.dumps(t).encode() for t in tickers}
+    weather_body = json.dumps(payloads.air_temperature(stations)).encode()
+    stats = {"requests": 0}
+
+    async def delay():
+        stats["requests"] += 1
+        wait = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if wait > 0:
+            await asyncio.sleep(wait / 1000)
+
+    async def ticker_24hr(request: Request):
+        await delay()
+        symbol = request.query_params.get("symbol")
+        if symbol is None:
+            return Response(tickers_body, media_type="application/json")
+        body = by_symbol.get(symbol)
+        if body is None:
+            return JSONResponse({"code": -1121, "msg": "Invalid symbol."}, status_code=400)
+        return Response(body, media_type="application/json")
+
+    async def klines(request: Request):
+        await delay()
+        params = request.query_params
+        interval = params.get("interval", "1h")
+        if not params.get("symbol", "").isalnum() or interval not in INTERVAL_MS:
+            return JSONResponse({"code": -1121, "msg": "Invalid symbol."}, status_code=400)
+        limit = min(int(params.get("limit", 500)), MAX_KLINES)
+        start_time = int(params["startTime"]) if "startTime" in params else None
+        return JSONResponse(payloads.klines(limit, INTERVAL_MS[interval], start_time))
+
+    async def air_temperature(request: Request):
+        await delay()
+        return Response(weather_body, media_type="application/json")
+
+    async def stub_stats(request: Request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/api/v3/ticker/24hr", ticker_24hr),
+        Route("/api/v3/klines", klines),
+        Route("/v1/environment/air-temperature", air_temperature),
+        Route("/_stats", stub_stats),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every upstream response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--symbols", type=int, default=3000, help="size of the 24hr ticker payload")
+    parser.add_argument("--stations", type=int, default=15)
+    args = parser.parse_args()
+    app = create_stub_app(args.latency_ms, args.jitter_ms, args.symbols, args.stations)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
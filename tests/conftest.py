@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Point everything that touches disk at a scratch directory before app modules are imported
+_scratch = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/app.db")
+os.environ.setdefault("WEATHER_HISTORY_DB", f"{_scratch}/weather_history.db")
+os.environ.setdefault("UPLOAD_DIR", f"{_scratch}/uploads")
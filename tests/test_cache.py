@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.cache import SnapshotCache, TTLCache
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        cache = SnapshotCache(loader, ttl=60)
+        snapshots = await asyncio.gather(*(cache.get() for _ in range(10)))
+        return snapshots
+
+    snapshots = asyncio.run(main())
+    assert len(calls) == 1
+    assert {s.version for s in snapshots} == {1}
+    assert not any(s.stale for s in snapshots)
+
+
+def test_stale_snapshot_is_served_while_refreshing():
+    values = iter([1, 2])
+
+    async def loader():
+        return next(values)
+
+    async def main():
+        cache = SnapshotCache(loader, ttl=0.01, max_stale=60)
+        first = await cache.get()
+        await asyncio.sleep(0.02)
+        stale = await cache.get()
+        await asyncio.sleep(0)  # let the background refresh finish
+        await asyncio.sleep(0)
+        return first, stale, cache.snapshot
+
+    first, stale, latest = asyncio.run(main())
+    assert (first.value, first.stale) == (1, False)
+    assert (stale.value, stale.version, stale.stale) == (1, 1, True)
+    assert (latest.value, latest.version) == (2, 2)
+
+
+def test_stale_if_error_falls_back_then_gives_up():
+    fail = {"now": False}
+
+    async def loader():
+        if fail["now"]:
+            raise RuntimeError("upstream down")
+        return "good"
+
+    async def main():
+        cache = SnapshotCache(loader, ttl=0, stale_if_error=0.05)
+        await cache.get()
+        fail["now"] = True
+        fallback = await cache.get()
+        await asyncio.sleep(0.06)
+        with pytest.raises(RuntimeError):
+            await cache.get()
+        return fallback
+
+    fallback = asyncio.run(main())
+    assert (fallback.value, fallback.stale) == ("good", True)
+
+
+def test_unchanged_value_keeps_version():
+    value = object()
+
+    async def loader():
+        return value
+
+    async def main():
+        cache = SnapshotCache(loader, ttl=0)
+        return [(await cache.get()).version for _ in range(3)]
+
+    assert asyncio.run(main()) == [1, 1, 1]
+
+
+def test_ttl_cache_expiry_and_lru():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("old", 4, expires_at=time.time() - 1)
+    assert cache.get("old") is None
+    assert cache.pop("c") == 3 and cache.get("c") is None
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.http_clients import InstrumentedTransport
+
+
+def _breaker(**overrides):
+    settings = dict(failure_ratio=0.5, window=4, min_calls=4, slow_seconds=1.0, open_seconds=60)
+    settings.update(overrides)
+    return CircuitBreaker("test", **settings)
+
+
+def _calls(breaker, *outcomes, elapsed=0.01):
+    for ok in outcomes:
+        breaker.before_call()
+        breaker.record(ok, elapsed)
+
+
+def test_opens_once_the_failure_ratio_is_reached():
+    breaker = _breaker()
+    _calls(breaker, True, False, True)
+    assert breaker.state == CLOSED  # below min_calls
+    _calls(breaker, False)
+    assert breaker.state == OPEN
+
+    # Only the last `window` calls count
+    breaker = _breaker()
+    _calls(breaker, False, True, True, True, True, False)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    breaker = _breaker()
+    _calls(breaker, True, True)
+    _calls(breaker, True, True, elapsed=1.5)
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_rejects_with_retry_after():
+    breaker = _breaker(open_seconds=30)
+    _calls(breaker, False, False, False, False)
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.status_code == 503
+    assert 29 <= int(raised.value.headers["Retry-After"]) <= 30
+
+
+def test_half_open_lets_one_probe_through_then_closes_or_reopens():
+    breaker = _breaker(open_seconds=0.05)
+    _calls(breaker, False, False, False, False)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # the probe is still in flight
+    breaker.record(False, 0.01)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+    # Closing starts a fresh window
+    _calls(breaker, False, True, True)
+    assert breaker.state == CLOSED
+
+
+def test_transport_times_the_whole_body():
+    class SlowBody(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"["
+            await asyncio.sleep(0.2)
+            yield b"]"
+
+    breaker = _breaker(min_calls=1, window=1, slow_seconds=0.1)
+    transport = InstrumentedTransport(
+        "test", httpx.MockTransport(lambda request: httpx.Response(200, stream=SlowBody())), breaker
+    )
+
+    async def main():
+        async with httpx.AsyncClient(transport=transport, base_url="http://upstream") as client:
+            return await client.get("/slow")
+
+    response = asyncio.run(main())
+    assert response.json() == []
+    # The headers were immediate; the trickled body still makes it a slow call
+    assert breaker.state == OPEN
+
+
+def test_transport_records_responses_whose_body_is_already_read():
+    breaker = _breaker(min_calls=1, window=1)
+    transport = InstrumentedTransport(
+        "test", httpx.MockTransport(lambda request: httpx.Response(503, json={"msg": "down"})), breaker
+    )
+
+    async def main():
+        async with httpx.AsyncClient(transport=transport, base_url="http://upstream") as client:
+            await client.get("/down")
+
+    asyncio.run(main())
+    assert breaker.state == OPEN
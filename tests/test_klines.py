@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.klines import CLOSE, KlineStore, RingBuffer
+
+
+def _candles(start, count):
+    times = np.arange(start, start + count, dtype=np.int64) * 60_000
+    ohlc = np.repeat(np.arange(start, start + count, dtype=np.float64)[:, None], 4, axis=1)
+    return times, ohlc
+
+
+def test_extend_keeps_time_order_and_wraps():
+    buffer = RingBuffer(5)
+    assert buffer.last_time is None
+    assert buffer.extend(*_candles(0, 3)) == 3
+    assert buffer.extend(*_candles(3, 4)) == 4  # two oldest candles are overwritten
+
+    times, ohlc = buffer.tail(10)
+    assert times.tolist() == [t * 60_000 for t in range(2, 7)]
+    assert ohlc[:, CLOSE].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+    assert buffer.last_time == 6 * 60_000
+    assert buffer.tail(2)[0].tolist() == [5 * 60_000, 6 * 60_000]
+
+
+def test_extend_replaces_the_open_candle_and_ignores_older_ones():
+    buffer = RingBuffer(10)
+    buffer.extend(*_candles(0, 3))
+
+    # The last candle comes back with a new close, along with one older candle
+    times, ohlc = _candles(1, 2)
+    ohlc[1, CLOSE] = 99.0
+    assert buffer.extend(times, ohlc) == 1
+    assert buffer.tail(10)[1][:, CLOSE].tolist() == [0.0, 1.0, 99.0]
+
+    # Unchanged data changes nothing
+    assert buffer.extend(times, ohlc) == 0
+
+
+def test_extend_more_than_capacity_keeps_the_newest():
+    buffer = RingBuffer(4)
+    buffer.extend(*_candles(0, 2))
+    buffer.extend(*_candles(2, 10))
+    assert buffer.size == 4
+    assert buffer.tail(4)[0].tolist() == [t * 60_000 for t in range(8, 12)]
+
+    buffer.clear()
+    assert buffer.size == 0 and buffer.last_time is None
+
+
+def test_store_serves_buffered_candles_when_a_refetch_fails():
+    rows = [[t * 60_000, "1", "2", "0.5", str(t)] for t in range(5)]
+    state = {"fail": False}
+
+    class Client:
+        async def get(self, path, params):
+            if state["fail"]:
+                raise CircuitOpenError("binance", 30)
+            return httpx.Response(200, json=rows[-params["limit"]:])
+
+    async def main():
+        store = KlineStore(lambda: Client(), refresh_interval=0, max_series=4, capacity=10)
+        _, times, _ = await store.get("btcusdt", "1m", 3)
+        state["fail"] = True
+        # Asking for more candles than buffered would normally refetch; with the upstream down
+        # the buffered ones are served instead of an error
+        _, stale_times, ohlc = await store.get("BTCUSDT", "1m", 5)
+        with pytest.raises(CircuitOpenError):
+            await store.get("ETHUSDT", "1m", 5)
+        return times, stale_times, ohlc
+
+    times, stale_times, ohlc = asyncio.run(main())
+    assert times.tolist() == stale_times.tolist() == [2 * 60_000, 3 * 60_000, 4 * 60_000]
+    assert ohlc[:, CLOSE].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_fetch_only_reports_unknown_symbols_as_not_found():
+    responses = {
+        "NOPE": httpx.Response(400, json={"code": -1121, "msg": "Invalid symbol."}),
+        "BUSY": httpx.Response(429, json={"code": -1003, "msg": "Too many requests."}),
+        "DOWN": httpx.Response(503, text="Service Unavailable"),
+    }
+
+    class Client:
+        async def get(self, path, params):
+            return responses[params["symbol"]]
+
+    async def main():
+        store = KlineStore(lambda: Client(), refresh_interval=0, max_series=4, capacity=10)
+        codes = []
+        for symbol in responses:
+            try:
+                await store.get(symbol, "1m", 5)
+            except Exception as e:
+                codes.append(e.status_code)
+        return codes
+
+    assert asyncio.run(main()) == [404, 429, 503]
@@ -0,0 +1,94 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from app.services import responses
+from app.services.responses import EncodedBody, ResponseCache, encoded_response
+
+
+def _request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def _body(size=2000):
+    return EncodedBody({"data": "x" * size})
+
+
+def test_matching_if_none_match_gets_an_empty_304():
+    body = _body()
+    assert encoded_response(_request(), body).status_code == 200
+
+    for header in (body.etag, f"W/{body.etag}", f'"other", {body.etag}', "*"):
+        response = encoded_response(_request(if_none_match=header), body)
+        assert response.status_code == 304, header
+        assert response.body == b""
+        assert response.headers["etag"] == body.etag
+
+    assert encoded_response(_request(if_none_match='"other"'), body).status_code == 200
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip;q=1.0", "gzip"),
+    ("br;q=1.0, gzip;q=0.8", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+])
+def test_encoding_follows_accept_encoding_quality(monkeypatch, accept, expected):
+    pytest.importorskip("brotli")
+    body = _body()
+    response = encoded_response(_request(accept_encoding=accept), body)
+    assert response.headers.get("content-encoding") == expected
+    assert response.headers["vary"] == "Accept-Encoding"
+    if expected == "gzip":
+        assert gzip.decompress(response.body) == body.identity
+    elif expected is None:
+        assert response.body == body.identity
+
+
+def test_small_bodies_are_not_compressed(monkeypatch):
+    monkeypatch.setattr(responses, "COMPRESS_MIN_BYTES", 512)
+    small = EncodedBody({"data": "x"})
+    assert len(small.identity) < 512
+    response = encoded_response(_request(accept_encoding="gzip"), small)
+    assert "content-encoding" not in response.headers
+    assert response.body == small.identity
+
+    monkeypatch.setattr(responses, "COMPRESS_MIN_BYTES", len(small.identity))
+    response = encoded_response(_request(accept_encoding="gzip"), small)
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_response_cache_rebuilds_only_on_a_new_version():
+    cache = ResponseCache(maxsize=2)
+    builds = []
+
+    def build(value):
+        def _build():
+            builds.append(value)
+            return {"value": value}
+        return _build
+
+    first = cache.get("key", 1, build("a"))
+    assert cache.get("key", 1, build("b")) is first
+    assert builds == ["a"]
+
+    second = cache.get("key", 2, build("c"))
+    assert second is not first
+    assert second.etag != first.etag
+    assert builds == ["a", "c"]
+
+    # Least recently used keys are dropped beyond maxsize
+    cache.get("other", 1, build("d"))
+    cache.get("third", 1, build("e"))
+    assert len(cache) == 2
+    cache.get("key", 2, build("f"))
+    assert builds[-1] == "f"
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.migrations import load_models
+from app.services.revocation import RevocationStore
+
+
+def _run(tmp_path, scenario):
+    async def main():
+        load_models()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/revocations.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            return await scenario(sessions)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_revoke_is_seen_locally_and_by_other_workers_after_a_refresh(tmp_path):
+    async def scenario(sessions):
+        worker_a = RevocationStore(sessions, sessions, sync_interval=30, refresh_interval=1)
+        worker_b = RevocationStore(sessions, sessions, sync_interval=30, refresh_interval=1)
+        await worker_a.sync()
+        await worker_b.sync()
+
+        async with sessions() as db:
+            await worker_a.revoke(db, "jti-1", time.time() + 3600)
+        assert worker_a.is_revoked("jti-1")
+
+        # Worker B only looks at its in-memory set until its next refresh
+        assert not worker_b.is_revoked("jti-1")
+        await worker_b.refresh()
+        assert worker_b.is_revoked("jti-1")
+        assert not worker_b.is_revoked("jti-2")
+
+    _run(tmp_path, scenario)
+
+
+def test_new_columns_are_added_to_existing_tables(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+
+    from app import migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        # revoked_tokens as it was before revoked_at
+        conn.execute(text("CREATE TABLE revoked_tokens (jti VARCHAR PRIMARY KEY, expires_at DATETIME NOT NULL)"))
+    migrations.load_models()
+    with engine.begin() as conn:
+        migrations._migrate(conn)
+        inspector = inspect(conn)
+        columns = {column["name"] for column in inspector.get_columns("revoked_tokens")}
+        indexes = {index["name"] for index in inspector.get_indexes("revoked_tokens")}
+    engine.dispose()
+    assert "revoked_at" in columns
+    assert "ix_revoked_tokens_revoked_at" in indexes
+
+
+def test_expired_tokens_are_not_stored_and_sync_prunes(tmp_path):
+    async def scenario(sessions):
+        store = RevocationStore(sessions, sessions, sync_interval=30, refresh_interval=1)
+        async with sessions() as db:
+            await store.revoke(db, "expired", time.time() - 1)
+            await store.revoke(db, "short", time.time() + 0.1)
+        assert not store.is_revoked("expired")
+        assert store.is_revoked("short")
+
+        await asyncio.sleep(0.15)
+        await store.sync()
+        assert "short" not in store._revoked
+        assert not store.is_revoked("short")
+
+    _run(tmp_path, scenario)
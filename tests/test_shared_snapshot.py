@@ -0,0 +1,69 @@
+import asyncio
+
+import numpy as np
+
+from app.services.shared_snapshot import MappedSnapshot, SharedSnapshot, write_snapshot
+
+
+def test_write_and_map_round_trip(tmp_path):
+    path = str(tmp_path / "s.snap")
+    arrays = {
+        "prices": np.array([1.5, 2.5, np.nan]),
+        "order": np.array([2, 0, 1], dtype=np.int32),
+        "names": np.array([b"BTC", b"ETHUSDT", b""]),
+        "empty": np.zeros(0, dtype=np.float64),
+        "grid": np.arange(6, dtype=np.int64).reshape(2, 3),
+    }
+    write_snapshot(path, 7, arrays, {"timestamp": "t0"})
+
+    mapped = MappedSnapshot(path)
+    assert mapped.version == 7 and mapped.meta == {"timestamp": "t0"}
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(mapped.arrays[name], array)
+        assert mapped.arrays[name].dtype == array.dtype
+        assert not mapped.arrays[name].flags.writeable  # a view of the read-only mapping
+
+
+def _encode(value):
+    return {"values": np.array(value, dtype=np.float64)}, {}
+
+
+def _decode(arrays, meta):
+    return arrays["values"].tolist()
+
+
+def test_only_the_leader_fetches_and_followers_decode_once_per_version(tmp_path):
+    directory = str(tmp_path / "shared")
+    fetches = []
+    decodes = []
+
+    async def fetch():
+        fetches.append(1)
+        return [float(len(fetches))]
+
+    def decode(arrays, meta):
+        decodes.append(1)
+        return _decode(arrays, meta)
+
+    async def main():
+        leader = SharedSnapshot("feed", directory, fetch, _encode, decode, interval=0.2)
+        follower = SharedSnapshot("feed", directory, fetch, _encode, decode, interval=0.2)
+        assert await leader.load() == [1.0] and leader.is_leader
+
+        first = await follower.load()
+        assert first == [1.0] and not follower.is_leader
+        assert await follower.load() is first  # same version: same object, not re-decoded
+
+        await asyncio.sleep(0.25)
+        assert await leader.load() == [2.0]
+        assert await follower.load() == [2.0]
+
+        # When the leader goes away, the follower takes over the lock
+        await leader.stop()
+        await asyncio.sleep(0.25)
+        assert await follower.load() == [3.0] and follower.is_leader
+        await follower.stop()
+
+    asyncio.run(main())
+    assert len(fetches) == 3
+    assert len(decodes) == 2
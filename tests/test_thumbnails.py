@@ -0,0 +1,51 @@
+import asyncio
+
+from app.migrations import run_migrations_async
+from app.services import thumbnails as thumbnails_module
+from app.services.photo_storage import UPLOAD_URL_PREFIX
+from app.services.thumbnails import ThumbnailPipeline, pick_variant
+
+
+def test_pick_variant_falls_back_to_the_original():
+    variants = {"64": "/v64", "128": "/v128"}
+    assert pick_variant("/orig", variants, 32) == "/v64"
+    assert pick_variant("/orig", variants, 100) == "/v128"
+    # Upscaling the largest thumbnail would look worse than the original
+    assert pick_variant("/orig", variants, 512) == "/orig"
+    assert pick_variant("/orig", {}, 64) == "/orig"
+
+
+def test_every_uploader_of_a_photo_in_progress_is_invalidated(monkeypatch):
+    photo_url = f"{UPLOAD_URL_PREFIX}/shared.jpg"
+    invalidated = []
+
+    class Cache:
+        def invalidate(self, email=None, user_id=None):
+            invalidated.append(email)
+
+    async def main():
+        await run_migrations_async()
+        rendered = asyncio.Event()
+
+        def render(source, sizes, image_format, quality):
+            # Hold the render until the second upload has been submitted
+            asyncio.run_coroutine_threadsafe(rendered.wait(), loop).result()
+            return {size: f"shared_{size}.{image_format}" for size in sizes}
+
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(thumbnails_module, "_render_variants", render)
+        monkeypatch.setattr(thumbnails_module, "user_cache", Cache())
+        pipeline = ThumbnailPipeline((64,), "webp", 80, workers=1)
+        # No process pool: the render runs on the default thread pool
+        monkeypatch.setattr(pipeline, "start", lambda: None)
+
+        pipeline.submit(photo_url, "first@example.com")
+        pipeline.submit(photo_url, "second@example.com")
+        assert len(pipeline._tasks) == 1
+        rendered.set()
+        await asyncio.gather(*pipeline._tasks)
+        return pipeline
+
+    pipeline = asyncio.run(main())
+    assert sorted(invalidated) == ["first@example.com", "second@example.com"]
+    assert not pipeline._in_progress
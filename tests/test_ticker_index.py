@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from app.services.shared_snapshot import MappedSnapshot, write_snapshot
+from app.services.ticker_index import NUMERIC_FIELDS, TickerIndex
+
+
+def _tickers(n=300, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "symbol": f"SYM{i}{'USDT' if i % 3 else 'BTC'}",
+            "lastPrice": f"{rng.uniform(0.01, 1000):.8f}",
+            "priceChangePercent": f"{rng.uniform(-20, 20):.3f}",
+            # Repeated volumes exercise the stable tie order
+            "volume": f"{rng.choice([0, 10, 100, rng.uniform(0, 1e6)]):.8f}",
+            "highPrice": "1",
+            "lowPrice": "0.5",
+            "quoteVolume": "10",
+            "closeTime": 1700000000000 + i,
+        }
+        for i in range(n)
+    ]
+
+
+def _reference(items, sort_by, descending, limit, min_volume=0, min_price=0, min_change=-100, max_change=100,
+               symbol_filter=None):
+    rows = [
+        item for item in items
+        if min_change <= float(item["priceChangePercent"]) <= max_change
+        and float(item["volume"]) >= min_volume
+        and float(item["lastPrice"]) >= min_price
+        and (not symbol_filter or symbol_filter.upper() in item["symbol"].upper())
+    ]
+    rows.sort(key=lambda item: float(item[sort_by]), reverse=descending)
+    return [item["symbol"] for item in rows[:limit]]
+
+
+@pytest.mark.parametrize("sort_by", NUMERIC_FIELDS)
+@pytest.mark.parametrize("descending", [False, True])
+def test_query_matches_a_plain_sort(sort_by, descending):
+    items = _tickers()
+    index = TickerIndex(items)
+    for params in [
+        {"limit": 10},
+        {"limit": 50, "min_volume": 50, "min_change": -5, "max_change": 5},
+        {"limit": 500, "min_price": 100, "symbol_filter": "btc"},
+    ]:
+        got = [row["symbol"] for row in index.query(sort_by, descending, **params)]
+        assert got == _reference(items, sort_by, descending, **params)
+
+
+def test_point_and_batch_lookups():
+    index = TickerIndex(_tickers(20))
+    assert index.get("sym1usdt")["symbol"] == "SYM1USDT"
+    assert index.get("NOPE") is None
+    found, missing = index.lookup(["SYM2USDT", "nope", "sym0btc"])
+    assert [row["symbol"] for row in found] == ["SYM2USDT", "SYM0BTC"]
+    assert missing == ["nope"]
+
+
+def test_unparseable_rows_are_skipped():
+    items = _tickers(3)
+    items[1]["lastPrice"] = "not a number"
+    index = TickerIndex(items)
+    assert len(index) == 2 and index.get(items[1]["symbol"]) is None
+
+
+def test_column_round_trip_answers_the_same(tmp_path):
+    items = _tickers()
+    index = TickerIndex(items)
+    arrays, meta = index.to_arrays()
+    write_snapshot(str(tmp_path / "t.snap"), 1, arrays, meta)
+    mapped = MappedSnapshot(str(tmp_path / "t.snap"))
+    restored = TickerIndex.from_arrays(mapped.arrays, mapped.meta)
+
+    assert len(restored) == len(index) and restored.timestamp == index.timestamp
+    for sort_by in NUMERIC_FIELDS:
+        for descending in (False, True):
+            params = {"limit": 40, "min_volume": 5, "symbol_filter": "usdt"}
+            assert restored.query(sort_by, descending, **params) == index.query(sort_by, descending, **params)
+    assert restored.lookup(["SYM5USDT", "nope"]) == index.lookup(["SYM5USDT", "nope"])
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.services.cache import Snapshot
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.ticker_index import TickerIndex
+from app.services.ticker_stream import TickerHub
+
+
+def _index(prices):
+    return TickerIndex([
+        {"symbol": symbol, "lastPrice": str(price), "priceChangePercent": "0", "volume": "1", "closeTime": 1}
+        for symbol, price in prices.items()
+    ])
+
+
+class FakeCache:
+    def __init__(self, value):
+        self.snapshot = Snapshot(value=value, fetched_at=time.monotonic(), version=1)
+        self.gets = 0
+
+    async def get(self):
+        self.gets += 1
+        return self.snapshot
+
+    def publish(self, value):
+        self.snapshot = Snapshot(value=value, fetched_at=time.monotonic(), version=self.snapshot.version + 1)
+
+
+def _parse(message: bytes):
+    event, data = message.decode().strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_stream_sends_a_snapshot_then_diffs():
+    params = dict(sort_by="lastPrice", descending=True, limit=2)
+
+    async def main():
+        cache = FakeCache(_index({"AAA": 3, "BBB": 2, "CCC": 1}))
+        hub = TickerHub(cache, poll_interval=0.01, queue_size=4, heartbeat=5)
+        events = hub.events(("key",), params, cache.snapshot)
+
+        first = _parse(await events.__anext__())
+        assert hub.subscriber_count == 1
+
+        cache.publish(_index({"AAA": 3, "BBB": 2, "CCC": 5}))
+        second = _parse(await asyncio.wait_for(events.__anext__(), 1))
+
+        await events.aclose()
+        assert hub.subscriber_count == 0
+        await hub.stop()
+        return first, second, cache.gets
+
+    (name, snapshot), (diff_name, diff), gets = asyncio.run(main())
+    assert name == "snapshot"
+    assert snapshot["version"] == 1
+    assert [row["symbol"] for row in snapshot["data"]] == ["AAA", "BBB"]
+
+    assert diff_name == "diff"
+    assert diff["version"] == 2
+    assert [row["symbol"] for row in diff["changed"]] == ["CCC"]
+    assert diff["removed"] == ["BBB"]
+    assert diff["order"] == ["CCC", "AAA"]
+    # The poller reads the cache (whose TTL decides upstream calls); it never forces a refresh
+    assert gets >= 1
+
+
+def test_stream_returns_503_before_streaming_when_upstream_is_down(monkeypatch):
+    from app.main import app
+    from app.routers import crypto
+
+    async def unavailable():
+        raise CircuitOpenError("binance", 30)
+
+    monkeypatch.setattr(crypto.ticker_cache, "loader", unavailable)
+    crypto.ticker_cache.invalidate()
+    with TestClient(app) as client:
+        token = client.post("/auth/register", json={"email": "stream@example.com", "password": "pw"}).json()
+        response = client.get(
+            "/crypto/tickers/stream", headers={"Authorization": f"Bearer {token['access_token']}"}
+        )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+
+
+def test_late_subscriber_with_an_older_snapshot_starts_from_the_group():
+    params = dict(sort_by="lastPrice", descending=True, limit=2)
+
+    async def main():
+        cache = FakeCache(_index({"AAA": 3, "BBB": 2, "CCC": 1}))
+        old_snapshot = cache.snapshot
+        hub = TickerHub(cache, poll_interval=60, queue_size=4, heartbeat=60)
+        cache.publish(_index({"AAA": 3, "BBB": 2, "CCC": 5}))
+        early = hub.subscribe(("key",), params, cache.snapshot)
+        late = hub.subscribe(("key",), params, old_snapshot)
+
+        early_messages = [early.queue.get_nowait() for _ in range(early.queue.qsize())]
+        late_message = late.queue.get_nowait()
+        hub.unsubscribe(early)
+        hub.unsubscribe(late)
+        await hub.stop()
+        return early_messages, late_message
+
+    early_messages, late_message = asyncio.run(main())
+    # The early subscriber only got its snapshot: no diff back to version 1
+    assert [_parse(message)[0] for message in early_messages] == ["snapshot"]
+    name, snapshot = _parse(late_message)
+    assert name == "snapshot"
+    assert snapshot["version"] == 2
+    assert [row["symbol"] for row in snapshot["data"]] == ["CCC", "AAA"]
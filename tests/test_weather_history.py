@@ -0,0 +1,39 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from app.services.weather_history import WeatherHistory
+
+
+def test_history_buckets_and_stop_releases_threads_and_connections(tmp_path):
+    history = WeatherHistory(str(tmp_path / "history.db"), ingest_interval=60, retention_days=0, readers=2)
+
+    async def main():
+        for minute, value in enumerate([25.0, 27.0, 26.0, 30.0]):
+            await history.add(f"2024-01-01T00:{minute:02d}:00+00:00", [
+                {"station_id": "S1", "value": value},
+                {"station_id": "S2", "value": None},
+            ])
+        # Re-ingesting the same snapshot is a no-op
+        assert await history.add("2024-01-01T00:00:00+00:00", [{"station_id": "S1", "value": 99.0}]) == 0
+
+        start = 1704067200  # 2024-01-01T00:00:00Z
+        result = await history.history("S1", start, start + 240, points=2)
+        assert result["bucket_seconds"] == 120
+        assert result["timestamps"] == [start, start + 120]
+        assert result["min"] == [25.0, 26.0] and result["max"] == [27.0, 30.0]
+        assert result["avg"] == [26.0, 28.0] and result["count"] == [2, 2]
+        assert (await history.history("S2", start, start + 240, points=2))["count"] == []
+
+        connections = list(history._connections)
+        await history.stop()
+        return connections
+
+    connections = asyncio.run(main())
+    assert connections and history._connections == []
+    assert not any(t.name.startswith("weather-history") for t in threading.enumerate())
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+from app.services.weather_snapshot import WeatherSnapshot
+
+
+def _document():
+    stations = [
+        {"id": f"S{i}", "device_id": f"S{i}", "name": f"Station {i}",
+         "location": {"latitude": 1.30 + i * 0.01, "longitude": 103.80 + i * 0.01}}
+        for i in range(6)
+    ]
+    readings = [{"station_id": f"S{i}", "value": 25.0 + i} for i in (1, 3, 4, 5)]
+    # Readings for stations missing from the metadata must not shrink the search
+    readings += [{"station_id": "UNKNOWN1", "value": 1.0}, {"station_id": "UNKNOWN2", "value": 2.0}]
+    return {"metadata": {"stations": stations}, "items": [{"timestamp": "2024-01-01T00:00:00+08:00", "readings": readings}]}
+
+
+def test_nearest_skips_stations_without_readings(monkeypatch):
+    from app.main import app
+    from app.routers import weather
+
+    snapshot = WeatherSnapshot(_document())
+    assert snapshot.stations_without_reading == 2
+
+    async def cached():
+        return snapshot
+
+    monkeypatch.setattr(weather.weather_snapshots, "loader", cached)
+    weather.weather_snapshots.invalidate()
+    with TestClient(app) as client:
+        token = client.post("/auth/register", json={"email": "nearest@example.com", "password": "pw"}).json()
+        response = client.get(
+            "/weather/nearest", params={"lat": 1.30, "lon": 103.80, "k": 4},
+            headers={"Authorization": f"Bearer {token['access_token']}"}
+        )
+    weather.weather_snapshots.invalidate()
+    assert response.status_code == 200
+    assert [s["station_id"] for s in response.json()["stations"]] == ["S1", "S3", "S4", "S5"]
+
+
+def test_column_round_trip_keeps_stations_and_readings():
+    snapshot = WeatherSnapshot(_document())
+    arrays, meta = snapshot.to_arrays()
+    restored = WeatherSnapshot.from_arrays(arrays, meta, previous=snapshot)
+    assert restored.station_list == snapshot.station_list
+    assert restored.current == snapshot.current
+    assert restored.tree is snapshot.tree  # unchanged stations reuse the spatial index